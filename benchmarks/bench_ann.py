@@ -0,0 +1,52 @@
+"""Recall and latency of the IVF index against exact search
+
+Embeddings are synthetic: clustered unit vectors standing for specialities.
+
+Usage: python -m benchmarks.bench_ann [--professors 20000] [--areas 5] [--dim 256]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.ann import IVFIndex, measure_recall
+from src.embeddings import normalize_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--professors", type=int, default=20_000)
+    parser.add_argument("--areas", type=int, default=5, help="specialities per professor")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=500, help="distinct speciality clusters")
+    parser.add_argument("--lists", type=int, default=256)
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--noise", type=float, default=1.5, help="noise norm relative to the cluster centres")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    topics = normalize_rows(rng.normal(size=(args.topics, args.dim)))
+
+    def sample(count: int) -> np.ndarray:
+        noise = rng.normal(size=(count, args.dim)) * args.noise / np.sqrt(args.dim)
+        return normalize_rows(topics[rng.integers(args.topics, size=count)] + noise)
+
+    index = IVFIndex(n_lists=args.lists, train_size=50_000)
+    start = time.perf_counter()
+    for first in range(0, args.professors, 1000):
+        index.add_many((professor_id, sample(args.areas)) for professor_id in range(first, min(first + 1000, args.professors)))
+    if index.centroids is None:
+        index.train()
+    print(f"{len(index)} vectors indexed in {time.perf_counter() - start:.1f} s")
+    queries = sample(args.queries)
+    for n_probe in args.probes:
+        index.n_probe = n_probe
+        recall, approximate, exact = measure_recall(index, queries, args.k)
+        print(f"n_probe {n_probe:3d}: recall@{args.k} {recall:.3f}, {approximate:7.2f} ms vs exact {exact:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
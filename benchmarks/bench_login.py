@@ -0,0 +1,62 @@
+"""Load benchmark of login password checks under concurrent attempts
+
+Every attempt runs on its own thread, like a Streamlit session, and checks a
+password against a stored hash. The direct bcrypt calls (the former Hasher
+behaviour) are compared with the bounded Hasher worker pool.
+
+Usage: python -m benchmarks.bench_login [--attempts 64] [--rounds 10] [--workers 2]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import bcrypt
+
+from src.hasher import Hasher
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(check: Callable[[str, str], bool], hashed_pw: str, attempts: int) -> List[float]:
+    """Start every login attempt at once and return their latencies in milliseconds"""
+
+    def attempt(_) -> float:
+        start = time.perf_counter()
+        assert check(hashed_pw, "senha-correta")
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=attempts) as sessions:
+        return list(sessions.map(attempt, range(attempts)))
+
+
+def report(name: str, latencies: List[float]) -> None:
+    print(
+        f"{name:>10}: p50 {percentile(latencies, 0.5):8.1f} ms, p99 {percentile(latencies, 0.99):8.1f} ms, "
+        f"max {max(latencies):8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attempts", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    hasher = Hasher(rounds=args.rounds, max_workers=args.workers)
+    hashed_pw = hasher.hash_pw("senha-correta")
+    print(f"{args.attempts} concurrent logins, bcrypt cost {args.rounds}")
+    report("direct", run(lambda hashed, pw: bcrypt.checkpw(pw.encode(), hashed.encode()), hashed_pw, args.attempts))
+    report(f"pool({args.workers})", run(hasher.check_pw, hashed_pw, args.attempts))
+    stats = hasher.stats
+    print(f"queue wait: p50 {stats['wait_p50_ms']:.1f} ms, p99 {stats['wait_p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark of the streaming Lattes parser against the former minidom one
+
+Usage: python -m benchmarks.bench_parse [--resumes 20] [--publications 5000]
+"""
+
+import argparse
+import io
+import time
+import tracemalloc
+import xml.dom.minidom
+from typing import Callable, List, Tuple
+
+from benchmarks.synthetic import make_resumes
+from src.lattes import parse_lattes
+
+
+def parse_minidom(resume) -> Tuple[str, List[str]]:
+    """Parse a resume the way ResumesFacade.parse_resume used to"""
+    curriculo = xml.dom.minidom.parse(resume)
+    dados_gerais = curriculo.getElementsByTagName("DADOS-GERAIS")
+    nome_completo = dados_gerais[0].getAttribute("NOME-COMPLETO")
+    areas = []
+    for area in curriculo.getElementsByTagName("AREA-DE-ATUACAO"):
+        especialidade = area.getAttribute("NOME-DA-ESPECIALIDADE")
+        if especialidade == "":
+            especialidade = area.getAttribute("NOME-DA-SUB-AREA-DO-CONHECIMENTO")
+            if especialidade == "":
+                especialidade = area.getAttribute("NOME-DA-AREA-DO-CONHECIMENTO")
+        areas.append(especialidade)
+    return nome_completo, areas
+
+
+def measure(parser: Callable, resumes: List[bytes]) -> Tuple[float, float, list]:
+    """Measure the time per resume and the peak memory of a parser
+
+    Returns:
+        Tuple[float, float, list]: milliseconds per resume, peak MiB and the parsed results
+    """
+    start = time.perf_counter()
+    results = [parser(io.BytesIO(resume)) for resume in resumes]
+    elapsed = (time.perf_counter() - start) * 1000 / len(resumes)
+    tracemalloc.start()
+    parser(io.BytesIO(resumes[0]))
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return elapsed, peak, results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--resumes", type=int, default=20)
+    arg_parser.add_argument("--publications", type=int, default=5000)
+    args = arg_parser.parse_args()
+
+    resumes = make_resumes(args.resumes, args.publications)
+    size = sum(len(resume) for resume in resumes) / len(resumes) / 2 ** 20
+    print(f"{args.resumes} resumes, {size:.1f} MiB each")
+    minidom_ms, minidom_peak, expected = measure(parse_minidom, resumes)
+    streaming_ms, streaming_peak, results = measure(parse_lattes, resumes)
+    assert results == expected, "streaming parser results differ from minidom"
+    print(f"minidom:   {minidom_ms:8.2f} ms/resume, peak {minidom_peak:8.2f} MiB")
+    print(f"streaming: {streaming_ms:8.2f} ms/resume, peak {streaming_peak:8.2f} MiB")
+    print(f"speedup {minidom_ms / streaming_ms:.0f}x, memory {minidom_peak / streaming_peak:.0f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
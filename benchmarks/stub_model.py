@@ -0,0 +1,219 @@
+"""Local stand-in for the BGE-M3 inference endpoints
+
+Serves the two routes the app calls, with deterministic embeddings derived from
+a hash of every text, so rankings are reproducible without the real model:
+
+- POST /pipeline/feature-extraction: {"inputs": [texts]} -> one vector per text
+- POST /models/similarity: {"inputs": {"source_sentence", "sentences"}} -> one score per sentence
+
+Latency, the share of 503 answers and of requests that hang (answered only after
+hang_ms, past the client's timeout) are tunable to exercise the client retries and
+deadlines. fail_first answers the first requests with 503 whatever the error rate,
+malformed_rate answers 200 with a body that isn't JSON (e.g. a proxy error page) and
+max_in_flight records the highest number of requests served at the same time.
+
+Usage: python -m benchmarks.stub_model [--port 8700] [--latency-ms 50] [--error-rate 0.05] [--hang-rate 0.01]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import numpy as np
+
+FEATURE_EXTRACTION_PATH = "/pipeline/feature-extraction"
+SIMILARITY_PATH = "/models/similarity"
+
+
+class StubModelServer:
+    """Threaded HTTP server answering like the inference endpoints"""
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: Optional[float] = None,
+        dim: int = 64,
+        seed: int = 0,
+        fail_first: int = 0,
+        hang_rate: float = 0.0,
+        hang_ms: float = 60_000.0,
+        malformed_rate: float = 0.0,
+    ):
+        """Initialize the server, without starting it
+
+        Args:
+            port (int): listening port, a free one if 0
+            latency_ms (float): delay added to every answer
+            jitter_ms (float): maximum random delay added on top of latency_ms
+            error_rate (float): share of requests answered with 503
+            retry_after (Optional[float]): Retry-After seconds sent with the 503s, none if None
+            dim (int): embeddings dimension
+            seed (int): random seed of the errors and jitter
+            fail_first (int): number of first requests answered with 503
+            hang_rate (float): share of requests that hang
+            hang_ms (float): how long a hanging request waits before answering
+            malformed_rate (float): share of requests answered with 200 and a body that isn't JSON
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.dim = dim
+        self.fail_first = fail_first
+        self.hang_rate = hang_rate
+        self.hang_ms = hang_ms
+        self.malformed_rate = malformed_rate
+        self.requests = 0
+        self.errors = 0
+        self.hangs = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def feature_extraction_url(self) -> str:
+        return self.url + FEATURE_EXTRACTION_PATH
+
+    @property
+    def similarity_url(self) -> str:
+        return self.url + SIMILARITY_PATH
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Deterministic unit length embedding of every text
+
+        Args:
+            texts (List[str]): texts
+
+        Returns:
+            np.ndarray: (texts, dim) float32 matrix
+        """
+        vectors = np.stack([
+            np.random.default_rng(int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little"))
+            .standard_normal(self.dim)
+            for text in texts
+        ]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _answer(self, path: str, payload: dict) -> Optional[list]:
+        """Body of a successful answer, None for an unknown route"""
+        if path == FEATURE_EXTRACTION_PATH:
+            inputs = payload["inputs"]
+            return self.embed([inputs] if isinstance(inputs, str) else inputs).tolist()
+        if path == SIMILARITY_PATH:
+            source = self.embed([payload["inputs"]["source_sentence"]])[0]
+            sentences = payload["inputs"]["sentences"]
+            return (self.embed(sentences) @ source).tolist() if sentences else []
+        return None
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    delay = stub.latency_ms + stub._random.uniform(0, stub.jitter_ms)
+                    failed = stub.requests <= stub.fail_first or stub._random.random() < stub.error_rate
+                    malformed = not failed and stub._random.random() < stub.malformed_rate
+                    if failed:
+                        stub.errors += 1
+                    elif stub._random.random() < stub.hang_rate:
+                        stub.hangs += 1
+                        delay = stub.hang_ms
+                try:
+                    time.sleep(delay / 1000)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+                if failed:
+                    self._send(503, {"error": "Model is currently loading"})
+                    return
+                if malformed:
+                    self._send_raw(200, b"<html>Bad gateway</html>", "text/html")
+                    return
+                answer = stub._answer(self.path, payload)
+                if answer is None:
+                    self._send(404, {"error": "not found"})
+                else:
+                    self._send(200, answer)
+
+            def _send(self, status: int, body) -> None:
+                self._send_raw(status, json.dumps(body).encode(), "application/json")
+
+            def _send_raw(self, status: int, data: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                if status == 503 and stub.retry_after is not None:
+                    self.send_header("Retry-After", str(stub.retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> "StubModelServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-model", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubModelServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests that hang")
+    parser.add_argument("--hang-ms", type=float, default=60_000.0)
+    args = parser.parse_args()
+    server = StubModelServer(
+        args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.retry_after, args.dim,
+        hang_rate=args.hang_rate, hang_ms=args.hang_ms,
+    ).start()
+    print(f"Serving {server.feature_extraction_url} and {server.similarity_url}, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Synthetic Lattes resumes for benchmarks"""
+
+import random
+from typing import List
+from xml.sax.saxutils import quoteattr
+
+AREAS = [
+    ("Ciências Exatas e da Terra", "Ciência da Computação", "Inteligência Artificial"),
+    ("Ciências Exatas e da Terra", "Ciência da Computação", "Sistemas de Computação"),
+    ("Ciências Exatas e da Terra", "Ciência da Computação", "Metodologia e Técnicas da Computação"),
+    ("Ciências Exatas e da Terra", "Ciência da Computação", ""),
+    ("Ciências Exatas e da Terra", "Matemática", "Matemática Aplicada"),
+    ("Ciências Exatas e da Terra", "Probabilidade e Estatística", ""),
+    ("Engenharias", "Engenharia Elétrica", "Telecomunicações"),
+    ("Ciências da Saúde", "Saúde Coletiva", "Epidemiologia"),
+    ("Ciências Humanas", "Educação", "Tecnologia Educacional"),
+    ("Ciências Sociais Aplicadas", "Ciência da Informação", ""),
+]
+WORDS = "aprendizado de máquina redes neurais otimização sistemas distribuídos dados saúde ensino análise".split()
+
+
+def make_resume(index: int, publications: int = 1000, areas: int = 4, seed: int = 0) -> bytes:
+    """Build a Lattes-like resume encoded as ISO-8859-1
+
+    Args:
+        index (int): resume number, used in the professor's name and identifier
+        publications (int): number of papers in the production section
+        areas (int): number of AREA-DE-ATUACAO elements
+        seed (int): random seed
+
+    Returns:
+        bytes: XML document
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    parts = [
+        '<?xml version="1.0" encoding="ISO-8859-1" standalone="no"?>',
+        f'<CURRICULO-VITAE SISTEMA-ORIGEM-XML="LATTES_OFFLINE" NUMERO-IDENTIFICADOR="{index:016d}" '
+        f'DATA-ATUALIZACAO="{rng.randint(1, 28):02d}{rng.randint(1, 12):02d}2024">',
+        f'<DADOS-GERAIS NOME-COMPLETO="Professor Sintético {index}" NACIONALIDADE="B">',
+        "<AREAS-DE-ATUACAO>",
+    ]
+    for sequence in range(areas):
+        grande_area, area, especialidade = rng.choice(AREAS)
+        parts.append(
+            f'<AREA-DE-ATUACAO SEQUENCIA-AREA-DE-ATUACAO="{sequence + 1}" '
+            f'NOME-GRANDE-AREA-DO-CONHECIMENTO={quoteattr(grande_area)} '
+            f'NOME-DA-AREA-DO-CONHECIMENTO={quoteattr(area)} '
+            f'NOME-DA-SUB-AREA-DO-CONHECIMENTO="" '
+            f'NOME-DA-ESPECIALIDADE={quoteattr(especialidade)}/>'
+        )
+    parts.append("</AREAS-DE-ATUACAO></DADOS-GERAIS><PRODUCAO-BIBLIOGRAFICA><ARTIGOS-PUBLICADOS>")
+    for sequence in range(publications):
+        titulo = " ".join(rng.choices(WORDS, k=10)).capitalize()
+        parts.append(
+            f'<ARTIGO-PUBLICADO SEQUENCIA-PRODUCAO="{sequence + 1}">'
+            f'<DADOS-BASICOS-DO-ARTIGO NATUREZA="COMPLETO" TITULO-DO-ARTIGO={quoteattr(titulo)} '
+            f'ANO-DO-ARTIGO="{rng.randint(1990, 2024)}" IDIOMA="Português"/>'
+            f'<DETALHAMENTO-DO-ARTIGO TITULO-DO-PERIODICO-OU-REVISTA="Revista {rng.randint(1, 500)}" '
+            f'VOLUME="{rng.randint(1, 50)}" PAGINA-INICIAL="1" PAGINA-FINAL="20"/>'
+            f'<AUTORES NOME-COMPLETO-DO-AUTOR="Professor Sintético {index}" ORDEM-DE-AUTORIA="1"/>'
+            "</ARTIGO-PUBLICADO>"
+        )
+    parts.append("</ARTIGOS-PUBLICADOS></PRODUCAO-BIBLIOGRAFICA></CURRICULO-VITAE>")
+    return "".join(parts).encode("iso-8859-1")
+
+
+def make_resumes(count: int, publications: int = 1000, areas: int = 4, seed: int = 0) -> List[bytes]:
+    """Build several synthetic resumes
+
+    Args:
+        count (int): number of resumes
+        publications (int): number of papers per resume
+        areas (int): number of specialities per resume
+        seed (int): random seed
+
+    Returns:
+        List[bytes]: XML documents
+    """
+    return [make_resume(index, publications, areas, seed) for index in range(count)]
@@ -5,7 +5,7 @@ from typing import Union
 import streamlit as st
 from src.database import Database
 from src.hasher import Hasher
-from src.helpers import fetch_cookies, setup_database_connection
+from src.helpers import fetch_cookies, get_database, get_hasher
 
 
 class LoginPage:
@@ -15,10 +15,8 @@ class LoginPage:
         self.cookies = fetch_cookies()
         if self.cookies.get("authentication_status") == "autorizado":
             st.switch_page("pages/resumes.py")
-        if "db_connection" not in st.session_state:
-            setup_database_connection()
-            st.rerun()
-        self.db: Database = st.session_state["db_connection"]
+        self.db: Database = get_database()
+        self.hasher: Hasher = get_hasher()
         self._render_login_page()
 
     def _render_login_page(self) -> None:
@@ -48,7 +46,9 @@ class LoginPage:
             self.cookies["authentication_status"] = "dados_invalidos"
             return "Por favor, preencha os campos necessários."
         user = self.db.read_user(self.email)
-        if not user.empty and Hasher.check_pw(user.at[0, "senha"], self.password):
+        if not user.empty and self.hasher.check_pw(user.at[0, "senha"], self.password):
+            if self.hasher.needs_rehash(user.at[0, "senha"]):
+                self.db.update_password(user.at[0, "id"], self.email, self.hasher.hash_pw(self.password))
             self.cookies["username"] = user.at[0, "username"]
             self.cookies["user_id"] = str(user.at[0, "id"])
             self.cookies["authentication_status"] = "autorizado"
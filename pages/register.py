@@ -5,7 +5,7 @@ from typing import Union
 import streamlit as st
 from src.database import Database
 from src.hasher import Hasher
-from src.helpers import fetch_cookies, setup_database_connection
+from src.helpers import fetch_cookies, get_database, get_hasher
 
 
 class RegisterPage:
@@ -13,10 +13,8 @@ class RegisterPage:
 
     def __init__(self) -> None:
         self.cookies = fetch_cookies()
-        if "db_connection" not in st.session_state:
-            setup_database_connection()
-            st.rerun()
-        self.db: Database = st.session_state["db_connection"]
+        self.db: Database = get_database()
+        self.hasher: Hasher = get_hasher()
         self._render_register_page()
 
     def _render_register_page(self) -> None:
@@ -50,7 +48,7 @@ class RegisterPage:
         if not user.empty:
             self.cookies["authentication_status"] = "nao_autorizado"
             return "Usuário com este email já está cadastrado"
-        hashed_pw = Hasher.hash_pw(self.password)
+        hashed_pw = self.hasher.hash_pw(self.password)
         user = self.db.create_user(self.username, self.email, hashed_pw)
         if not user.empty:
             self.cookies["username"] = self.username
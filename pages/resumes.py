@@ -1,179 +1,215 @@
 """Class and methods to render resumes page"""
 
-from time import time
-import xml.dom.minidom
-from collections import defaultdict
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
+import numpy as np
 import pandas as pd
 import streamlit as st
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 from src.database import Database
-from src.helpers import fetch_cookies, setup_database_connection
+from src.facade import ResumesFacade
+from src.helpers import (
+    fetch_cookies, get_database, get_ingest_queue, get_metrics, get_result_cache, get_scoring_backend,
+    show_timings_panel,
+)
+from src.jobs import IngestQueue, QueueFullError
+from src.metrics import metrics
 
 
-class ResumesFacade:
-    """Class to perform parsing and similarity calculation with resumes"""
+class ResumesPage:
+    """Class to render resumes page"""
+
+    def __init__(self) -> None:
+        self.cookies = fetch_cookies()
+        if self.cookies.get("authentication_status") != "autorizado":
+            st.switch_page("pages/login.py")
+        self.db: Database = get_database()
+        get_metrics()
+        self._render_resumes_page()
+
+    @property
+    def facade(self) -> ResumesFacade:
+        """The session's facade, created on the first suggestion instead of on every rerun"""
+        facade = st.session_state.get("resumes_facade")
+        if facade is None:
+            facade = ResumesFacade(self.db, get_scoring_backend(), result_cache=get_result_cache())
+            st.session_state["resumes_facade"] = facade
+        return facade
 
-    def __init__(self, db, api_url, headers):
-        self.db = db
-        self.api_url = api_url
-        self.headers = headers
+    @property
+    def ingest_queue(self) -> IngestQueue:
+        """The background queue the uploads are processed by"""
+        return get_ingest_queue()
 
-    def _validate_theme_and_resumes(self, tcc_theme: Optional[str], resumes: Optional[List[UploadedFile]], professors: pd.DataFrame | None) -> bool:
-        """Validate if the theme and resumes are None
+    def _calculate_similarity(self, professors: pd.DataFrame, tcc_theme: str) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Score the professors, reporting model failures to the user
+
+        Catalogs with at least [ann_index] threshold professors are ranked by the embeddings
+        index, only the [ann_index] top_k most similar are shown.
 
         Args:
-            tcc_theme (Optional[str]): TCC theme
-            resumes (Optional[List[BytesIO]]): List of resumes
+            professors (pd.DataFrame): professors's names and specialities
+            tcc_theme (str): TCC theme
 
         Returns:
-            bool: True if theme and resumes are valid, False otherwise.
+            Tuple[pd.DataFrame, np.ndarray]: Score indexed by Professor, and the best professors
         """
-        if not tcc_theme:
-            st.warning(":warning: Tema do TCC não pode ser em branco.")
-            return False
-        if professors is None:
-            if not resumes:
-                st.warning(":warning: É necessário fazer o upload de pelo menos 1 currículo.")
-                return False
-        return True
-
-    def parse_resume(self, resumes: Optional[List[UploadedFile]]) -> Optional[Dict[str, List[str]]]:
-        """Parse the XML resumes, get the specialities for every professor
+        config = st.secrets.get("ann_index", {})
+        top_k = config.get("top_k", 100) if len(professors) >= config.get("threshold", 5000) else None
+        try:
+            professors_scores, melhores_professores, used_fallback = self.facade.calculate_similarity(
+                professors, tcc_theme, top_k
+            )
+        except ConnectionRefusedError as e:
+            print(e)
+            st.error("Um problema com o modelo aconteceu :sadface:. Tente novamente em alguns minutos.")
+            (professors_scores, melhores_professores), used_fallback = self.facade.scores_frame({}), False
+        if used_fallback:
+            st.info(":hourglass: O modelo está indisponível, a similaridade foi calculada por palavras-chave.")
+        if top_k is not None:
+            st.caption(f"Mostrando os {top_k} professores mais compatíveis de {len(professors)}.")
+        return professors_scores, melhores_professores
 
-        Args:
-            resumes (List[BytesIO]): professors's resumes
+    def _render_resumes_page(self):
+        """Render the resumes page
 
-        Returns:
-            Dict[str, List[str]]: Dict containing the professor's name with his specialities.
+        The inputs live in a form, so typing the theme or picking files doesn't rerun the
+        script, only submitting it does. New uploads are processed by the background
+        ingestion queue, whose progress is polled until the professors can be ranked.
         """
-        professors = defaultdict(list)
-        if resumes:
-            for resume in resumes:
-                curriculo = xml.dom.minidom.parse(resume)
-                dados_gerais = curriculo.getElementsByTagName("DADOS-GERAIS")
-                nome_completo = dados_gerais[0].getAttribute("NOME-COMPLETO")
-                areas_de_atuacao = curriculo.getElementsByTagName("AREA-DE-ATUACAO")
-                for area in areas_de_atuacao:
-                    especialidade = area.getAttribute("NOME-DA-ESPECIALIDADE")
-                    if especialidade == "":
-                        especialidade = area.getAttribute("NOME-DA-SUB-AREA-DO-CONHECIMENTO")
-                        if especialidade == "":
-                            especialidade = area.getAttribute("NOME-DA-AREA-DO-CONHECIMENTO")
-                    professors[nome_completo].append(especialidade)
-
-            return professors
-
-    def _calculate_similarity(self, professors: pd.DataFrame, tcc_theme: str) -> pd.DataFrame:
-        """Calculate similarity between professors's and TCC theme strings.
+        with st.form("sugestao", border=False):
+            tcc_theme = st.text_input("Digite o tema do seu TCC abaixo :point_down:")
+            st.divider()
+            resumes = st.file_uploader(
+                "Faça o upload dos currículos dos professores :point_down:",
+                accept_multiple_files=True,
+                type=["xml", "zip"],
+            )
+            st.info(":file_folder: No momento, apenas arquivos XML do Lattes (ou um .zip com eles) são suportados")
+            st.divider()
+            submitted = st.form_submit_button("Sugerir professores")
+
+        if st.button("Sair"):
+            self.cookies["authentication_status"] = "nao_autorizado"
+            st.switch_page("main.py")
+
+        user_id = self.cookies["user_id"]
+        if submitted:
+            self._submit(tcc_theme, resumes)
+        if "ingest_job_id" not in st.session_state:
+            # A new session (e.g. after a reconnection) picks up the upload still being processed
+            active_jobs = self.db.read_ingest_jobs(user_id, active=True)
+            st.session_state["ingest_job_id"] = None if active_jobs.empty else int(active_jobs["job_id"].iloc[0])
+        if st.session_state["ingest_job_id"] is not None:
+            # The workers start with the queue, else a job left by a restarted process would never be claimed
+            get_ingest_queue()
+            self._show_ingest_progress(st.session_state["ingest_job_id"])
+        finished_job = st.session_state.pop("ingest_finished_job", None)
+        if finished_job is not None:
+            self._show_finished_job(finished_job)
+
+    def _submit(self, tcc_theme: str, resumes: Optional[List[UploadedFile]]) -> None:
+        """Queue the new uploads, or rank the registered professors right away when there's none
 
         Args:
-            professors (Dict[str, List[str]]): professors's names and specialities
             tcc_theme (str): TCC theme
+            resumes (Optional[List[UploadedFile]]): uploaded resumes
         """
-        scores = defaultdict(dict)
-        if not professors.empty:
-            for item in professors.to_dict(orient="records"):
-                try:
-                    scores_list = self._query_similarity({
-                        "inputs": {
-                            "source_sentence": f"{tcc_theme}",
-                            "sentences": [area for area in item["areas_de_atuacao"]],
-                        }
-                    })
-                except ConnectionRefusedError as e:
-                    print(e)
-                    st.error("Um problema com o modelo aconteceu :sadface:. Tente novamente em alguns minutos.")
-                scores[item["nome"]] = max(scores_list) * 100
-        professors_scores = pd.DataFrame.from_dict(scores, orient="index", columns=["Score"])
-        professors_scores.index.name = "Professor"
-        melhor_professor = professors_scores[professors_scores["Score"] == professors_scores["Score"].max()].index.values
-        return professors_scores, melhor_professor
-    
-    def _query_similarity(self, payload: Dict[str, str], max_retries: int=5, delay: int=2) -> Dict[str, str]:
-        """Performs query to BGE-M3 endpoint
+        user_id = self.cookies["user_id"]
+        professors_registered = self.db.read_professor(user_id)
+        validation_warning = self.facade.validate_theme_and_resumes(tcc_theme, resumes, professors_registered)
+        if validation_warning:
+            st.warning(validation_warning)
+            return
+        # Files already queued during this session (same upload, e.g. only the theme changed) aren't sent again
+        ingested = st.session_state.setdefault("ingested_uploads", {}).setdefault(user_id, set())
+        resumes = [resume for resume in resumes or [] if resume.file_id not in ingested]
+        if not resumes:
+            self._show_suggestion(tcc_theme, professors_registered)
+            return
+        if st.session_state.get("ingest_job_id") is not None:
+            st.warning(":hourglass: Aguarde o processamento dos currículos enviados anteriormente.")
+            return
+        try:
+            job_id = self.ingest_queue.submit(
+                user_id, [(resume.name, resume.getvalue()) for resume in resumes], tcc_theme
+            )
+        except QueueFullError as e:
+            print(e)
+            st.warning(
+                ":hourglass: Muitos currículos sendo processados no momento. Tente novamente em alguns minutos."
+            )
+            return
+        ingested.update(resume.file_id for resume in resumes)
+        st.session_state["ingest_job_id"] = job_id
+
+    def _show_ingest_progress(self, job_id: int) -> None:
+        """Poll the progress of an upload being processed, rerunning the page once it's finished
 
         Args:
-            payload (Dict[str, str]): payload to send
-            retries (int): number of retries
-            delay (int): delay to retry in seconds
+            job_id (int): ingestion job id
         """
-        retries = 0
-        while retries < max_retries:
-            response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=30)
-            if response.ok:
-                return response.json()
-            else:
-                print(f"Código 503 retornado, tentando novamente em {delay} segundos")
-                time.sleep(delay)
-        
-        raise ConnectionRefusedError("Número de tentativas de conexão máxima excedida, modelo está indisponível.")
 
-class ResumesPage:
-    """Class to render resumes page"""
-
-    def __init__(self) -> None:
-        self.cookies = fetch_cookies()
-        self.api_url = "https://api-inference.huggingface.co/models/BAAI/bge-m3"
-        self.headers = {"Authorization": f"Bearer {st.secrets.api_token}"}
-        if self.cookies.get("authentication_status") != "autorizado":
-            st.switch_page("pages/login.py")
-        if "db_connection" not in st.session_state:
-            setup_database_connection()
+        @st.experimental_fragment(run_every=st.secrets.get("ingest_queue", {}).get("poll_every", 2))
+        def ingest_progress():
+            jobs = self.db.read_ingest_jobs(self.cookies["user_id"], job_id=job_id)
+            job = None if jobs.empty else jobs.iloc[0]
+            if job is not None and job["status"] in ("queued", "running"):
+                label = "Currículos na fila de processamento"
+                if job["status"] == "running":
+                    label = job["stage"] or "Processando currículos"
+                st.progress(
+                    job["files_done"] / max(job["files_total"], 1),
+                    text=f"{label}... ({job['files_done']}/{job['files_total']} arquivo(s))",
+                )
+                return
+            st.session_state["ingest_job_id"] = None
+            st.session_state["ingest_finished_job"] = None if job is None else job.to_dict()
             st.rerun()
-        self.db: Database = st.session_state["db_connection"]
-        self.facade = ResumesFacade(self.db, self.api_url, self.headers)
-        self._render_resumes_page()
 
-    def _render_resumes_page(self):
-        """Render the resumes page"""
-        tcc_theme = st.text_input("Digite o tema do seu TCC abaixo :point_down:")
-        st.divider()
-        resumes = st.file_uploader(
-            "Faça o upload dos currículos dos professores :point_down:",
-            accept_multiple_files=True,
-            type="xml",
-        )
-        st.info(":file_folder: No momento, apenas arquivos XML do Lattes são suportados")
-        st.divider()
-        professors_registered = self.db.read_professor(self.cookies["user_id"])
-        theme_and_resumes_validated = self.facade._validate_theme_and_resumes(tcc_theme, resumes, professors_registered)
+        ingest_progress()
 
-        if st.button("Sair"):
-            self.cookies["authentication_status"] = "nao_autorizado"
-            st.switch_page("main.py")
+    def _show_finished_job(self, job: Dict[str, Any]) -> None:
+        """Report how an upload went and rank the professors for the theme it was sent with
 
-        if st.button("Sugerir professores") and theme_and_resumes_validated:
-            with st.status("Aguarde...", expanded=True) as status:
-                st.write("Processando currículos...")
-                if resumes:
-                    professors_resumes = self.facade.parse_resume(resumes)
-                    st.write("Criando professores no banco de dados...")
-                    professors_df: pd.DataFrame = self.db.create_professors(professors_resumes, self.cookies["user_id"])
-                    if professors_registered is None:
-                        professors_registered = professors_df
-                    else:
-                        professors_registered = professors_registered.concat([professors_df])
-                if not professors_registered.empty:
-                    st.write("Calculando similaridade...")
-                    professors_scores, melhores_professores = self.facade._calculate_similarity(professors_registered, tcc_theme)
-                    status.update(label="Concluído!", state="complete", expanded=False)
-                else:
-                    st.error("Ocorreu um erro. :confused:")
-            if not professors_scores.empty:
-                st.dataframe(professors_scores)
-                st.write(f"Professor(es) com maior compatibilidade detectada:")
-                for melhor_professor in melhores_professores:
-                    st.write(f"- :green[**{melhor_professor}**]")    
-
-    
-
-    
-
-    
+        Args:
+            job (Dict[str, Any]): ingestion job, as read by Database.read_ingest_jobs
+        """
+        for error in job["errors"]:
+            st.warning(f":warning: Não foi possível ler {error}")
+        if job["skipped"]:
+            st.write(f"{job['skipped']} currículo(s) sem alterações desde o último envio, ignorado(s).")
+        if job["status"] == "failed":
+            print(f"Ingestion job {job['job_id']} failed: {job['message']}")
+            st.error("Ocorreu um erro ao processar os currículos. :confused:")
+        if job["tema"]:
+            self._show_suggestion(job["tema"], self.db.read_professor(self.cookies["user_id"]))
+
+    def _show_suggestion(self, tcc_theme: str, professors_registered: Optional[pd.DataFrame]) -> None:
+        """Score every professor of the user and show the ranking
 
+        Args:
+            tcc_theme (str): TCC theme
+            professors_registered (Optional[pd.DataFrame]): professors registered by the user
+        """
+        if professors_registered is None or professors_registered.empty:
+            st.error("Ocorreu um erro. :confused:")
+            return
+        with st.status("Calculando similaridade...", expanded=True) as status:
+            with metrics.trace() as timings:
+                with metrics.span("resumes.suggest"):
+                    professors_scores, melhores_professores = self._calculate_similarity(
+                        professors_registered, tcc_theme
+                    )
+            status.update(label="Concluído!", state="complete", expanded=False)
+            if timings and show_timings_panel():
+                st.dataframe(pd.DataFrame(timings), hide_index=True)
+        if not professors_scores.empty:
+            st.write(f"Tema: **{tcc_theme}**")
+            st.dataframe(professors_scores)
+            st.write(f"Professor(es) com maior compatibilidade detectada:")
+            for melhor_professor in melhores_professores:
+                st.write(f"- :green[**{melhor_professor}**]")
 
 ResumesPage()
@@ -0,0 +1,298 @@
+"""Approximate nearest-neighbour index over the specialities embeddings"""
+
+import os
+import tempfile
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class IVFIndex:
+    """Inverted file index (k-means coarse quantizer) over unit length embeddings
+
+    Every professor owns one vector per speciality and is scored by his best one.
+    Until there are enough vectors to train the quantizer, searches are exact.
+    """
+
+    def __init__(
+        self,
+        n_lists: int = 256,
+        n_probe: int = 16,
+        train_size: int = 20_000,
+        path: Optional[str] = None,
+        save_every: int = 256,
+        seed: int = 0,
+    ):
+        """Initialize an empty index
+
+        Args:
+            n_lists (int): number of k-means clusters
+            n_probe (int): number of clusters scanned per query
+            train_size (int): vectors needed (and sampled) to train the quantizer
+            path (Optional[str]): file the index is saved to
+            save_every (int): number of add/remove calls between automatic saves, 0 to disable them,
+                the ones since the last save are written by flush
+            seed (int): random seed of the k-means training
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.path = path
+        self.save_every = save_every
+        self.seed = seed
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.owners = np.zeros(0, dtype=np.int64)
+        self.lists = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.centroids: Optional[np.ndarray] = None
+        self._order: Optional[np.ndarray] = None
+        self._bounds: Optional[np.ndarray] = None
+        self._pending: List[Tuple[int, np.ndarray]] = []
+        self._ids = set()
+        self._mutations = 0
+        # Database time up to which every catalog change is in the index, see Database.sync_index
+        self.synced_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return int(self.alive.sum()) + sum(len(vectors) for _, vectors in self._pending)
+
+    def professor_ids(self) -> Set[int]:
+        """Ids of the professors in the index"""
+        with self._lock:
+            return set(self._ids)
+
+    def add(self, professor_id: int, vectors: np.ndarray) -> None:
+        """Add (or replace) the specialities embeddings of a professor
+
+        Args:
+            professor_id (int): professor id
+            vectors (np.ndarray): unit length embeddings, one row per speciality
+        """
+        self.add_many([(professor_id, vectors)])
+
+    def add_many(self, items: Iterable[Tuple[int, np.ndarray]]) -> None:
+        """Add (or replace) the specialities embeddings of several professors
+
+        Args:
+            items (Iterable[Tuple[int, np.ndarray]]): professor id and embeddings
+        """
+        items = [(int(professor_id), np.asarray(vectors, dtype=np.float32)) for professor_id, vectors in items]
+        items = [(professor_id, vectors) for professor_id, vectors in items if len(vectors)]
+        if not items:
+            return
+        with self._lock:
+            self._remove_ids([professor_id for professor_id, _ in items])
+            self._pending.extend(items)
+            self._ids.update(professor_id for professor_id, _ in items)
+            if self.centroids is None and len(self) >= self.train_size:
+                self.train()
+            self._changed()
+
+    def remove(self, professor_id: int) -> None:
+        """Remove a professor from the index
+
+        Args:
+            professor_id (int): professor id
+        """
+        with self._lock:
+            self._remove_ids([int(professor_id)])
+            self._changed()
+
+    def _remove_ids(self, professor_ids: List[int]) -> None:
+        """Mark the vectors of the given professors as removed, compacting when most are dead"""
+        removed = self._ids.intersection(professor_ids)
+        if not removed:
+            return
+        self._ids -= removed
+        self._pending = [(professor_id, vectors) for professor_id, vectors in self._pending if professor_id not in removed]
+        self.alive &= ~np.isin(self.owners, list(removed))
+        if len(self.alive) and self.alive.mean() < 0.5:
+            self.vectors = self.vectors[self.alive]
+            self.owners = self.owners[self.alive]
+            self.lists = self.lists[self.alive]
+            self.alive = np.ones(len(self.owners), dtype=bool)
+        self._order = None
+
+    def _changed(self) -> None:
+        """Invalidate the list boundaries and save the index every save_every mutations"""
+        self._order = None
+        self._mutations += 1
+        if self.path and self.save_every and self._mutations >= self.save_every:
+            self.save()
+
+    def flush(self) -> None:
+        """Save the index if it changed since the last save, e.g. when the process stops"""
+        with self._lock:
+            if self.path and self._mutations:
+                self.save()
+
+    def _consolidate(self) -> None:
+        """Move the vectors added since the last search into the index arrays"""
+        if not self._pending:
+            return
+        new_vectors = np.concatenate([vectors for _, vectors in self._pending])
+        new_owners = np.concatenate([np.full(len(vectors), professor_id) for professor_id, vectors in self._pending])
+        self._pending = []
+        self.vectors = new_vectors if self.vectors.size == 0 else np.concatenate([self.vectors, new_vectors])
+        self.owners = np.concatenate([self.owners, new_owners])
+        self.alive = np.concatenate([self.alive, np.ones(len(new_owners), dtype=bool)])
+        self.lists = np.concatenate([self.lists, self._assign(new_vectors)])
+        self._order = None
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest centroid of every vector, 0 while the quantizer isn't trained"""
+        if self.centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train(self, iterations: int = 10) -> None:
+        """Train the coarse quantizer with spherical k-means over a sample of the vectors
+
+        Args:
+            iterations (int): number of k-means iterations
+        """
+        with self._lock:
+            self._consolidate()
+            vectors = self.vectors[self.alive]
+            n_lists = min(self.n_lists, len(vectors))
+            if n_lists == 0:
+                return
+            rng = np.random.default_rng(self.seed)
+            sample = vectors[rng.choice(len(vectors), min(self.train_size, len(vectors)), replace=False)]
+            centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                order = np.argsort(assignment, kind="stable")
+                clusters, starts = np.unique(assignment[order], return_index=True)
+                sums = centroids.copy()
+                sums[clusters] = np.add.reduceat(sample[order], starts)
+                centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+            self.centroids = centroids.astype(np.float32)
+            self.lists = self._assign(self.vectors)
+            self._order = None
+
+    def _list_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Vector positions sorted by list, and where every list starts and ends"""
+        if self._order is None:
+            live = np.flatnonzero(self.alive)
+            self._order = live[np.argsort(self.lists[live], kind="stable")]
+            n_lists = len(self.centroids) if self.centroids is not None else 1
+            self._bounds = np.searchsorted(self.lists[self._order], np.arange(n_lists + 1))
+        return self._order, self._bounds
+
+    def search(
+        self, query: np.ndarray, k: int = 10, offset: int = 0, allowed: Optional[Iterable[int]] = None,
+        exact: bool = False,
+    ) -> List[Tuple[int, float]]:
+        """Find the professors whose best speciality is the most similar to the query
+
+        Args:
+            query (np.ndarray): unit length query embedding
+            k (int): page size
+            offset (int): number of professors skipped, for pagination
+            allowed (Optional[Iterable[int]]): only these professors are returned, all of them if None
+            exact (bool): scan every vector instead of the n_probe nearest lists
+
+        Returns:
+            List[Tuple[int, float]]: professor id and score, from the most to the least similar
+        """
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            self._consolidate()
+            if self.centroids is None or exact:
+                candidates = np.flatnonzero(self.alive)
+            else:
+                order, bounds = self._list_bounds()
+                probes = np.argsort(self.centroids @ query)[::-1][:self.n_probe]
+                candidates = np.concatenate([order[bounds[probe]:bounds[probe + 1]] for probe in probes])
+            if allowed is not None:
+                candidates = candidates[np.isin(self.owners[candidates], np.fromiter(allowed, dtype=np.int64))]
+            if not len(candidates):
+                return []
+            scores = self.vectors[candidates] @ query
+            owners = self.owners[candidates]
+        best_first = np.argsort(scores)[::-1]
+        owners, scores = owners[best_first], scores[best_first]
+        _, first = np.unique(owners, return_index=True)
+        first.sort()
+        page = first[offset:offset + k]
+        return list(zip(owners[page].tolist(), scores[page].tolist()))
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the index atomically
+
+        Args:
+            path (Optional[str]): destination file, the index's path if None
+        """
+        path = path or self.path
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._consolidate()
+            alive = self.alive
+            arrays = {
+                "vectors": self.vectors[alive],
+                "owners": self.owners[alive],
+                "lists": self.lists[alive],
+                "params": np.array([self.n_lists, self.n_probe, self.train_size, self.seed]),
+            }
+            if self.centroids is not None:
+                arrays["centroids"] = self.centroids
+            if self.synced_at is not None:
+                arrays["synced_at"] = np.array([self.synced_at])
+            descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".npz")
+            with os.fdopen(descriptor, "wb") as file:
+                np.savez(file, **arrays)
+            os.replace(temporary, path)
+            self._mutations = 0
+
+    @classmethod
+    def load(cls, path: str, save_every: int = 256) -> "IVFIndex":
+        """Load an index saved by save
+
+        Args:
+            path (str): index file
+            save_every (int): number of add/remove calls between automatic saves
+
+        Returns:
+            IVFIndex: loaded index
+        """
+        with np.load(path) as arrays:
+            n_lists, n_probe, train_size, seed = arrays["params"].tolist()
+            index = cls(n_lists, n_probe, train_size, path=path, save_every=save_every, seed=seed)
+            index.vectors = arrays["vectors"]
+            index.owners = arrays["owners"]
+            index.lists = arrays["lists"]
+            index.alive = np.ones(len(index.owners), dtype=bool)
+            if "centroids" in arrays:
+                index.centroids = arrays["centroids"]
+            if "synced_at" in arrays:
+                index.synced_at = float(arrays["synced_at"][0])
+        index._ids = set(index.owners.tolist())
+        return index
+
+
+def measure_recall(index: IVFIndex, queries: np.ndarray, k: int = 10) -> Tuple[float, float, float]:
+    """Compare the index against exact search
+
+    Args:
+        index (IVFIndex): index to evaluate
+        queries (np.ndarray): unit length queries, one per row
+        k (int): number of professors compared
+
+    Returns:
+        Tuple[float, float, float]: recall@k, mean approximate and mean exact latency in milliseconds
+    """
+    recalls, approximate, exact = [], 0.0, 0.0
+    for query in queries:
+        start = time.perf_counter()
+        found = {professor_id for professor_id, _ in index.search(query, k)}
+        approximate += time.perf_counter() - start
+        start = time.perf_counter()
+        expected = {professor_id for professor_id, _ in index.search(query, k, exact=True)}
+        exact += time.perf_counter() - start
+        recalls.append(len(found & expected) / max(len(expected), 1))
+    return float(np.mean(recalls)), approximate * 1000 / len(queries), exact * 1000 / len(queries)
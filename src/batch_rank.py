@@ -0,0 +1,197 @@
+"""Rank the professors for a whole cohort of TCC themes, without the Streamlit app
+
+Usage: python -m src.batch_rank RESUMES THEMES.csv --output ranking.csv [--top-k 10]
+
+RESUMES is a directory of Lattes XMLs (and zip archives of them) or a single zip.
+Every row of THEMES.csv is written back with the top-k professors for its theme
+(Posição, Professor and Score columns), as CSV or Parquet depending on --output;
+Parquet needs pyarrow, which isn't a dependency of the app (pip install pyarrow).
+The model token is read from --api-token or the HF_API_TOKEN environment variable.
+"""
+
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from src.cache import LRUCache, PersistentCache, SimilarityCache
+from src.facade import ResumesFacade
+from src.metrics import metrics
+from src.model_client import ModelClient
+from src.scoring import API_URL, EMBEDDING_URL, FallbackBackend, LexicalBackend, RemoteBackend, ScoringBackend
+
+
+def open_resumes(path: Path, stack: ExitStack) -> List[BinaryIO]:
+    """Open the resumes of a directory (recursively) or a single zip archive
+
+    Args:
+        path (Path): directory or zip archive
+        stack (ExitStack): closes the files
+
+    Returns:
+        List[BinaryIO]: binary files, named after their path
+    """
+    if path.is_dir():
+        paths = sorted(item for item in path.rglob("*") if item.suffix.lower() in (".xml", ".zip"))
+    else:
+        paths = [path]
+    return [stack.enter_context(open(item, "rb")) for item in paths]
+
+
+def build_backend(args: argparse.Namespace) -> ScoringBackend:
+    """Build the scoring backend chosen on the command line
+
+    Args:
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        ScoringBackend: remote, lexical, or remote falling back to lexical ("auto")
+    """
+    if args.backend == "lexical":
+        return LexicalBackend()
+    cache = None
+    if args.cache_path:
+        cache = SimilarityCache(LRUCache(max_entries=10_000), PersistentCache(args.cache_path))
+    client = ModelClient(headers={"Authorization": f"Bearer {args.api_token}"})
+    remote = RemoteBackend(client, API_URL, embedding_url=EMBEDDING_URL, max_batch_size=args.batch_size, cache=cache)
+    if args.backend == "remote":
+        return remote
+    return FallbackBackend(remote, LexicalBackend())
+
+
+class RankingWriter:
+    """Appends ranking chunks to a CSV or Parquet file as they are produced"""
+
+    def __init__(self, path: str):
+        """Initialize the writer, nothing is written before the first chunk
+
+        Args:
+            path (str): ranking file, written as Parquet if it ends with .parquet and as CSV otherwise
+        """
+        self.path = path
+        self.parquet = path.lower().endswith(".parquet")
+        self._writer = None
+        self._header = True
+
+    def write(self, ranking: pd.DataFrame) -> None:
+        """Append a chunk of rankings, creating the file (and the CSV header) on the first one
+
+        Args:
+            ranking (pd.DataFrame): theme rows with Posição, Professor and Score columns
+        """
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(ranking, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            ranking.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+            self._header = False
+
+    def close(self) -> None:
+        """Finish the Parquet file, whose footer is only written on close; CSV chunks are already on disk"""
+        if self._writer is not None:
+            self._writer.close()
+
+
+def iter_rankings(
+    facade: ResumesFacade, professors: pd.DataFrame, themes: Iterator[pd.DataFrame], column: str, k: int
+) -> Iterator[Tuple[pd.DataFrame, bool]]:
+    """Rank every chunk of themes, repeating each theme row for its top-k professors
+
+    Args:
+        facade (ResumesFacade): facade with the scoring backend
+        professors (pd.DataFrame): professors with nome, areas_de_atuacao and embeddings columns
+        themes (Iterator[pd.DataFrame]): chunks of the themes CSV
+        column (str): column with the themes
+        k (int): number of professors kept per theme
+
+    Returns:
+        Iterator[Tuple[pd.DataFrame, bool]]: theme rows with Posição, Professor and Score columns, and
+            whether they were scored by keywords
+    """
+    for chunk in themes:
+        chunk = chunk.reset_index(drop=True)
+        rankings = facade.rank_themes(professors, chunk[column].fillna("").astype(str).tolist(), k, len(chunk))
+        for ranked, used_fallback in rankings:
+            rows = chunk.iloc[ranked["Tema"].to_numpy()].reset_index(drop=True)
+            yield pd.concat([rows, ranked.drop(columns="Tema").reset_index(drop=True)], axis=1), used_fallback
+
+
+def main(argv: Optional[List[str]] = None):
+    """Parse the resumes, rank the professors for every theme and write the rankings
+
+    Args:
+        argv (Optional[List[str]]): command line arguments, sys.argv[1:] if None
+    """
+    parser = argparse.ArgumentParser(description="Rank the professors for every theme of a CSV")
+    parser.add_argument("resumes", type=Path, help="directory of Lattes XMLs (or zips of them), or a zip")
+    parser.add_argument("themes", help="CSV with one TCC theme per row")
+    parser.add_argument("--output", required=True, help="ranking file, .csv or .parquet")
+    parser.add_argument("--theme-column", default="tema")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=64, help="themes scored at a time")
+    parser.add_argument("--batch-size", type=int, default=64, help="sentences per model request")
+    parser.add_argument("--backend", choices=["auto", "remote", "lexical"], default="auto")
+    parser.add_argument("--api-token", default=os.environ.get("HF_API_TOKEN"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="resume parsing processes")
+    parser.add_argument("--cache-path", default=".cache/similarity.sqlite3", help="similarity cache, empty to disable")
+    parser.add_argument("--metrics", help="file the stage timings and model metrics are written to, as JSON")
+    args = parser.parse_args(argv)
+    metrics.enabled = bool(args.metrics)
+    if args.backend != "lexical" and not args.api_token:
+        parser.error("set HF_API_TOKEN or pass --api-token (or use --backend lexical)")
+    if args.output.lower().endswith(".parquet"):
+        # Checked before the resumes are parsed instead of failing on the first chunk
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            parser.error(f"writing .parquet needs pyarrow ({e}), run pip install pyarrow or write a .csv")
+
+    facade = ResumesFacade(None, build_backend(args))
+    with ExitStack() as stack:
+        resumes = open_resumes(args.resumes, stack)
+        if not resumes:
+            parser.error(f"no resumes found in {args.resumes}")
+        facade.ingest_pool = stack.enter_context(
+            ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+        )
+        parsed = facade.parse_resume(resumes)
+    for file_name, error in parsed.errors:
+        print(f"Skipping {file_name}: {error}")
+    embeddings = facade.embed_professors(parsed.professors)
+    professors = pd.DataFrame({
+        "nome": list(parsed.professors),
+        "areas_de_atuacao": list(parsed.professors.values()),
+        "embeddings": [embeddings.get(nome) for nome in parsed.professors],
+    })
+    print(f"{len(professors)} professors parsed, {len(embeddings)} embedded")
+
+    writer = RankingWriter(args.output)
+    themes = pd.read_csv(args.themes, chunksize=args.chunk_size)
+    written = fallback_rows = 0
+    try:
+        for ranking, used_fallback in iter_rankings(facade, professors, themes, args.theme_column, args.top_k):
+            writer.write(ranking)
+            written += len(ranking)
+            fallback_rows += len(ranking) if used_fallback else 0
+    finally:
+        writer.close()
+    if fallback_rows:
+        print(f"The model was unavailable, {fallback_rows} ranking rows were scored by keywords")
+    print(f"{written} ranking rows written to {args.output}")
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as file:
+            file.write(metrics.to_json())
+
+
+if __name__ == "__main__":
+    main()
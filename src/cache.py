@@ -0,0 +1,385 @@
+"""In-process and persistent caches"""
+
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from src.text import fold_text
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with optional TTL"""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        """Initialize the cache
+
+        Args:
+            max_entries (int): maximum number of entries kept
+            ttl (Optional[float]): time to live in seconds, None to never expire
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value from the cache
+
+        Args:
+            key (Hashable): entry key
+            default (Any): value returned when the key is missing or expired
+
+        Returns:
+            Any: cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value in the cache, evicting the least recently used entry if full
+
+        Args:
+            key (Hashable): entry key
+            value (Any): value to store
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove an entry from the cache
+
+        Args:
+            key (Hashable): entry key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Ratio of lookups that were hits"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class PersistentCache:
+    """SQLite backed cache with TTL and size based eviction"""
+
+    def __init__(self, path: str, max_entries: int = 100_000, ttl: Optional[float] = None, evict_every: int = 256):
+        """Open (and create, if needed) the cache file
+
+        Args:
+            path (str): SQLite file path
+            max_entries (int): maximum number of entries kept on disk
+            ttl (Optional[float]): time to live in seconds, None to never expire
+            evict_every (int): number of writes between eviction sweeps
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL
+            )"""
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._connection.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get the stored values for the given keys
+
+        Args:
+            keys (Iterable[str]): entry keys
+
+        Returns:
+            Dict[str, Any]: values found, missing and expired keys are left out
+        """
+        keys = list(keys)
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, value, created_at FROM cache WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if self.ttl is None or created_at + self.ttl > now:
+                        found[key] = pickle.loads(value)
+            if found:
+                self._connection.executemany(
+                    "UPDATE cache SET accessed_at = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._connection.commit()
+        return found
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """Store several values
+
+        Args:
+            items (Dict[str, Any]): values by key
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, pickle.dumps(value), now, now) for key, value in items.items()],
+            )
+            self._writes += len(items)
+            if self._writes >= self.evict_every:
+                self._writes = 0
+                self._evict(now)
+            self._connection.commit()
+
+    def _evict(self, now: float) -> None:
+        """Remove expired entries and the least recently accessed ones above the size cap
+
+        Args:
+            now (float): current timestamp
+        """
+        if self.ttl is not None:
+            self._connection.execute("DELETE FROM cache WHERE created_at <= ?", (now - self.ttl,))
+        self._connection.execute(
+            """DELETE FROM cache WHERE key IN (
+            SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class SimilarityCache:
+    """Two tier cache (memory and disk) for model results keyed on normalized text and model id"""
+
+    def __init__(self, memory: LRUCache, disk: Optional[PersistentCache] = None):
+        """Initialize the cache tiers
+
+        Args:
+            memory (LRUCache): in-process tier
+            disk (Optional[PersistentCache]): persistent tier
+        """
+        self.memory = memory
+        self.disk = disk
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # Guards the counters, the cache is shared by every session's thread
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_id: str, *texts: str) -> str:
+        """Build the cache key for the given model and texts
+
+        Args:
+            model_id (str): model identifier
+            texts (str): normalized texts
+
+        Returns:
+            str: cache key
+        """
+        return "\x1f".join((model_id, *texts))
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get cached values, looking first in memory and then on disk
+
+        Args:
+            keys (Iterable[str]): entry keys
+
+        Returns:
+            Dict[str, Any]: values found
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.memory.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        memory_hits = len(found)
+        from_disk = {}
+        if missing and self.disk is not None:
+            from_disk = self.disk.get_many(missing)
+            for key, value in from_disk.items():
+                self.memory.set(key, value)
+            found.update(from_disk)
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += len(from_disk)
+            self.misses += len(missing) - len(from_disk)
+        return found
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """Store values in both tiers
+
+        Args:
+            items (Dict[str, Any]): values by key
+        """
+        for key, value in items.items():
+            self.memory.set(key, value)
+        if self.disk is not None and items:
+            self.disk.set_many(items)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Hit and miss counters for both tiers"""
+        with self._lock:
+            memory_hits, disk_hits, misses = self.memory_hits, self.disk_hits, self.misses
+        total = memory_hits + disk_hits + misses
+        return {
+            "memory_hits": memory_hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_rate": (memory_hits + disk_hits) / total if total else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+class ResultCache:
+    """In-process LRU cache of theme rankings, keyed on the folded theme and the version of the professors set
+
+    Themes typed slightly differently ("Aprendizado de máquina na saúde" and
+    "aprendizado de maquina na saude") share an entry. The version changes with the
+    professors set, so adding or deleting a professor never serves a stale ranking.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = 64 * 1024 * 1024):
+        """Initialize the cache
+
+        Args:
+            max_entries (int): maximum number of rankings kept
+            max_bytes (Optional[int]): maximum memory taken by the rankings, no limit if None
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory_bytes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tcc_theme: str, version: str) -> Tuple[str, str]:
+        """Build the cache key: the theme without case, accents, punctuation and extra whitespace
+
+        Args:
+            tcc_theme (str): TCC theme
+            version (str): version of the professors set the theme is ranked against
+
+        Returns:
+            Tuple[str, str]: cache key
+        """
+        return fold_text(tcc_theme), version
+
+    def get(self, tcc_theme: str, version: str) -> Optional[Tuple["pd.DataFrame", "np.ndarray"]]:
+        """Get a ranking from the cache
+
+        Args:
+            tcc_theme (str): TCC theme
+            version (str): version of the professors set
+
+        Returns:
+            Optional[Tuple[pd.DataFrame, np.ndarray]]: scores and best professors, None if not cached
+        """
+        key = self.make_key(tcc_theme, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, tcc_theme: str, version: str, professors_scores: "pd.DataFrame", best: "np.ndarray") -> None:
+        """Store a ranking, evicting the least recently used ones beyond the entries or memory limit
+
+        Args:
+            tcc_theme (str): TCC theme
+            version (str): version of the professors set
+            professors_scores (pd.DataFrame): Score indexed by Professor
+            best (np.ndarray): best professors
+        """
+        size = int(professors_scores.memory_usage(index=True, deep=True).sum())
+        size += best.nbytes + sum(sys.getsizeof(name) for name in best)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        key = self.make_key(tcc_theme, version)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.memory_bytes -= previous[0]
+            self._entries[key] = (size, (professors_scores, best))
+            self.memory_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.memory_bytes > self.max_bytes
+            ):
+                evicted_size, _ = self._entries.popitem(last=False)[1]
+                self.memory_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every ranking from the cache"""
+        with self._lock:
+            self._entries.clear()
+            self.memory_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Hits, misses, hit rate, evictions, entries and memory taken by the rankings"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "memory_bytes": self.memory_bytes,
+        }
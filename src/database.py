@@ -1,52 +1,143 @@
 """Database related class and methods"""
 
-from typing import Dict, List, Optional, Union
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 
-import psycopg2
-import streamlit as st
 import pandas as pd
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.sql import text
 
+from src.cache import LRUCache
+from src.embeddings import unpack_embeddings
+from src.metrics import metrics
+
+if TYPE_CHECKING:
+    from src.ann import IVFIndex
+
+# pg_advisory_xact_lock key, serializes the ingestion jobs submissions
+INGEST_QUEUE_LOCK_KEY = 7_382_902
+
+# Seconds of catalog changes re-read before an index's synced_at: a row's updated_at is its transaction's
+# start, so a long transaction may commit after a later one whose rows the index already has
+INDEX_SYNC_OVERLAP = 600
+
 
 class Database:
     """Manages database functionality"""
 
-    # db_name: str
-    # db_user: str
-    # db_password: str
-    # db_host: str
-    # db_port: int
-    # connection: SQLConnection
-
-    def __init__(self):
-        """Initialize the database connection."""
-        try:
-            self.connection = st.connection(name="postgresql", type="sql")
-            print(f"Connection to {st.secrets.connections.postgresql.host} successful")
-        except psycopg2.OperationalError as e:
-            print(f"Database Error: '{e}'")
-
-    # @st.cache_resource
-    # def _create_connection(self) -> psycopg2.extensions.connection:
-    #     """Create and caches the connection with the database."""
-    #     return psycopg2.connect(
-    #         database=self.db_name,
-    #         user=self.db_user,
-    #         password=self.db_password,
-    #         host=self.db_host,
-    #         port=self.db_port,
-    #     )
-
-    def fetch_users(self) -> pd.DataFrame:
-        """Fetch all users data
-
-        Returns:
-            List[Dict]: users data
-        """
-        query = "SELECT * FROM users;"
-        users = self.connection.query(query)
-        return users
+    def __init__(
+        self, engine: Engine, cache_ttl: Optional[float] = 300, cache_entries: int = 1024,
+        index: Optional["IVFIndex"] = None,
+    ):
+        """Initialize the database on top of a pooled engine.
+
+        Args:
+            engine (Engine): SQLAlchemy engine, whose connection pool is shared by every session
+            cache_ttl (Optional[float]): seconds a cached read stays valid, None to keep it until invalidated
+            cache_entries (int): maximum number of users (and e-mails) kept in each read cache
+            index (Optional[IVFIndex]): embeddings index kept in sync with the professors writes
+        """
+        self.engine = engine
+        self.index = index
+        self._professors_cache = LRUCache(max_entries=cache_entries, ttl=cache_ttl)
+        self._users_cache = LRUCache(max_entries=cache_entries, ttl=cache_ttl)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextmanager
+    def _connect(self) -> Iterator[Connection]:
+        """Borrow a connection from the pool, measuring how long the checkout waited
+
+        Returns:
+            Iterator[Connection]: pooled connection, given back to the pool on exit
+        """
+        start = time.perf_counter()
+        with self.engine.connect() as connection:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            yield connection
+
+    @property
+    def pool_stats(self) -> Dict[str, float]:
+        """Connection pool usage: checked out and idle connections and checkout wait times"""
+        pool = self.engine.pool
+        stats = {"checkouts": self._checkouts}
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        stats["wait_avg_ms"] = self._wait_total / self._checkouts * 1000 if self._checkouts else 0.0
+        stats["wait_max_ms"] = self._wait_max * 1000
+        return stats
+
+    def _query(self, query: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """Run a read query
+
+        Args:
+            query (str): SQL query
+            params (Optional[Dict[str, Any]]): query parameters
+
+        Returns:
+            pd.DataFrame: query result
+        """
+        with self._connect() as cursor:
+            result = cursor.execute(text(query), params or {})
+            return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
 
+    @property
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Hits, misses and hit rate of the read caches"""
+        return {
+            name: {"hits": cache.hits, "misses": cache.misses, "hit_rate": cache.hit_rate, "entries": len(cache)}
+            for name, cache in (("professors", self._professors_cache), ("users", self._users_cache))
+        }
+
+    @metrics.timed("database.fetch_users")
+    def fetch_users(self, limit: Optional[int] = None, after_id: int = 0) -> pd.DataFrame:
+        """Fetch a page of users data, ordered by id
+
+        Args:
+            limit (Optional[int]): maximum number of users, all of them if None
+            after_id (int): only users with a greater id are fetched
+
+        Returns:
+            pd.DataFrame: users data
+        """
+        query = "SELECT id, username, email, professores FROM users WHERE id > :after_id ORDER BY id"
+        params = {"after_id": after_id}
+        if limit is not None:
+            query += " LIMIT :limit"
+            params["limit"] = limit
+        return self._query(query, params)
+
+    def iter_users(self, page_size: int = 500) -> Iterator[pd.DataFrame]:
+        """Stream users data page by page using keyset pagination
+
+        Args:
+            page_size (int): number of users per page
+
+        Returns:
+            Iterator[pd.DataFrame]: users data pages
+        """
+        after_id = 0
+        while True:
+            users = self.fetch_users(limit=page_size, after_id=after_id)
+            if users.empty:
+                return
+            yield users
+            if len(users) < page_size:
+                return
+            after_id = int(users["id"].iloc[-1])
+
+    @metrics.timed("database.read_user")
     def read_user(self, email: str) -> pd.DataFrame:
         """Check if a user exists in the database
 
@@ -56,10 +147,15 @@ class Database:
         Returns:
             Optional[Tuple[int, str, str]]: user_id, username and password
         """
-        query = "SELECT id, username, senha FROM users WHERE email = :email;"
-        user = self.connection.query(query, params={"email": email})
+        user = self._users_cache.get(email)
+        metrics.increment("cache_requests_total", cache="users", result="miss" if user is None else "hit")
+        if user is None:
+            query = "SELECT id, username, senha FROM users WHERE email = :email;"
+            user = self._query(query, {"email": email})
+            self._users_cache.set(email, user)
         return user
 
+    @metrics.timed("database.create_user")
     def create_user(self, username: str, email: str, password: str) -> pd.DataFrame:
         """Create user in the database
 
@@ -71,83 +167,556 @@ class Database:
         Returns:
             int: user id
         """
-        insert_query = "INSERT INTO users (username, email, senha) VALUES (:username, :email, :senha);"
-        select_query = "SELECT id FROM users WHERE email = :email;"
-        with self.connection.session as cursor:
-            cursor.execute(text(insert_query), {"username": username, "email": email, "senha": password})
+        insert_query = "INSERT INTO users (username, email, senha) VALUES (:username, :email, :senha) RETURNING id;"
+        with self._connect() as cursor:
+            result = cursor.execute(text(insert_query), {"username": username, "email": email, "senha": password})
+            user = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
             cursor.commit()
             print(f"{username} registered")
-        user = self.connection.query(select_query, params={"email": email})
+        self._users_cache.invalidate(email)
         return user
 
-    def create_professors(self, teachers: Optional[Dict[str, List[str]]], user_id: Union[str, int]) -> pd.DataFrame:
-        """Create professors in the database
+    @metrics.timed("database.update_password")
+    def update_password(self, user_id: Union[str, int], email: str, password: str) -> None:
+        """Replace the user's hashed password
 
         Args:
-            teachers (List[Dict[str, List[str]]]): professors's infos
             user_id (Union[str, int]): user id
+            email (str): user's email
+            password (str): new hashed password
+        """
+        query = "UPDATE users SET senha = :senha WHERE id = :user_id;"
+        with self._connect() as cursor:
+            cursor.execute(text(query), {"senha": password, "user_id": int(user_id)})
+            cursor.commit()
+        self._users_cache.invalidate(email)
+
+    @staticmethod
+    def catalog_key(
+        nome: str, specialities: List[str], content_hash: Optional[str] = None, lattes_id: Optional[str] = None
+    ) -> str:
+        """Key a professor is deduplicated by in the catalog shared by every user
+
+        Args:
+            nome (str): professor's name
+            specialities (List[str]): professor's specialities
+            content_hash (Optional[str]): fingerprint of the resume
+            lattes_id (Optional[str]): Lattes NUMERO-IDENTIFICADOR
 
         Returns:
-            pd.DataFrame: return user's professors
+            str: the Lattes id when known, else the name and fingerprint, else the name and specialities
         """
+        if lattes_id:
+            return f"lattes:{lattes_id}"
+        if content_hash:
+            return f"hash:{nome}\x1f{content_hash}"
+        return f"areas:{nome}\x1f" + hashlib.md5("\x1f".join(specialities).encode()).hexdigest()
 
-        professors_query = """INSERT INTO docentes (user_id, nome, areas_de_atuacao)
-        SELECT :user_id, :nome, :especialidade WHERE NOT EXISTS (
-        SELECT user_id, nome, areas_de_atuacao FROM docentes WHERE
-        user_id = :user_id AND nome = :nome AND areas_de_atuacao = :especialidade
-        );
+    @metrics.timed("database.find_embedded")
+    def find_embedded(
+        self, teachers: Dict[str, List[str]], fingerprints: Optional[Dict[str, str]] = None,
+        lattes_ids: Optional[Dict[str, str]] = None,
+    ) -> Set[str]:
+        """Find the professors already in the catalog with embeddings of the same specialities
+
+        Args:
+            teachers (Dict[str, List[str]]): specialities by professor's name
+            fingerprints (Optional[Dict[str, str]]): fingerprint of the resume by professor's name
+            lattes_ids (Optional[Dict[str, str]]): Lattes id by professor's name
+
+        Returns:
+            Set[str]: names of the professors that don't need to be embedded again
         """
-        user_query = """UPDATE users SET professores =
-        (SELECT ARRAY(
-            SELECT professor_id FROM docentes
-            WHERE docentes.user_id = :user_id)
-        )"""
-        return_professors_query = """SELECT professor_id, nome, areas_de_atuacao FROM docentes WHERE
-        docentes.user_id = :user_id;
+        if not teachers:
+            return set()
+        fingerprints = fingerprints or {}
+        lattes_ids = lattes_ids or {}
+        keys = {
+            self.catalog_key(teacher, specialities, fingerprints.get(teacher), lattes_ids.get(teacher)): teacher
+            for teacher, specialities in teachers.items()
+        }
+        query = """SELECT catalog_key, areas_de_atuacao FROM docentes
+        WHERE catalog_key = ANY(CAST(:keys AS text[])) AND embeddings IS NOT NULL;
         """
-        if teachers:
-            teachers_to_insert = [
-                {"user_id": int(user_id), "nome": teacher, "especialidade": specialities}
-                for teacher, specialities in teachers.items()
-            ]
-        with self.connection.session as cursor:
-            cursor.execute(text(professors_query), teachers_to_insert)
-            cursor.commit()
-            cursor.execute(text(user_query), {"user_id": int(user_id)})
+        cataloged = self._query(query, {"keys": list(keys)})
+        return {
+            keys[key] for key, areas in cataloged.itertuples(index=False) if list(areas) == list(teachers[keys[key]])
+        }
+
+    @metrics.timed("database.create_professors")
+    def create_professors(
+        self, teachers: Optional[Dict[str, List[str]]], user_id: Union[str, int],
+        embeddings: Optional[Dict[str, bytes]] = None, fingerprints: Optional[Dict[str, str]] = None,
+        lattes_ids: Optional[Dict[str, str]] = None,
+    ) -> pd.DataFrame:
+        """Add professors to the catalog and link them to the user with a single statement
+
+        Every professor is upserted on its catalog key (see catalog_key), so a resume
+        uploaded by several users is stored and embedded once. A user's previous link
+        to another professor with the same name (an older resume) is replaced, removing
+        that professor from the catalog when no other user is linked to it, and only
+        the user's own row in users has its professores array refreshed.
+
+        Args:
+            teachers (List[Dict[str, List[str]]]): professors's infos
+            user_id (Union[str, int]): user id
+            embeddings (Optional[Dict[str, bytes]]): packed specialities embeddings by professor's name
+            fingerprints (Optional[Dict[str, str]]): fingerprint of the resume by professor's name
+            lattes_ids (Optional[Dict[str, str]]): Lattes id by professor's name
+
+        Returns:
+            pd.DataFrame: professors changed in the catalog or newly linked to the user by this call
+        """
+        columns = ["professor_id", "nome", "areas_de_atuacao", "embeddings", "content_hash"]
+        if not teachers:
+            return pd.DataFrame(columns=columns)
+        embeddings = embeddings or {}
+        fingerprints = fingerprints or {}
+        lattes_ids = lattes_ids or {}
+        keys = {
+            self.catalog_key(teacher, specialities, fingerprints.get(teacher), lattes_ids.get(teacher)): teacher
+            for teacher, specialities in teachers.items()
+        }
+        # One array per column instead of one bind per value, so the statement is compiled once
+        # whatever the batch size. The specialities are JSON arrays since Postgres can't unnest ragged arrays.
+        teachers_keyed = list(keys.values())
+        params = {
+            "user_id": int(user_id),
+            "keys": list(keys),
+            "nomes": teachers_keyed,
+            "especialidades": [json.dumps(list(teachers[teacher])) for teacher in teachers_keyed],
+            "embeddings": [embeddings.get(teacher) for teacher in teachers_keyed],
+            "hashes": [fingerprints.get(teacher) for teacher in teachers_keyed],
+            "lattes_ids": [lattes_ids.get(teacher) for teacher in teachers_keyed],
+        }
+        query = """WITH incoming (catalog_key, nome, areas_de_atuacao, embeddings, content_hash, lattes_id) AS (
+            SELECT catalog_key, nome, ARRAY(
+                SELECT area FROM jsonb_array_elements_text(especialidades) WITH ORDINALITY AS areas (area, position)
+                ORDER BY position
+            ), embeddings, content_hash, lattes_id
+            FROM unnest(
+                CAST(:keys AS text[]), CAST(:nomes AS text[]), CAST(:especialidades AS jsonb[]),
+                CAST(:embeddings AS bytea[]), CAST(:hashes AS text[]), CAST(:lattes_ids AS text[])
+            ) AS incoming (catalog_key, nome, especialidades, embeddings, content_hash, lattes_id)
+        ), upserted AS (
+            INSERT INTO docentes (catalog_key, nome, areas_de_atuacao, embeddings, content_hash, lattes_id)
+            SELECT * FROM incoming
+            ON CONFLICT (catalog_key) DO UPDATE SET
+            nome = EXCLUDED.nome,
+            areas_de_atuacao = EXCLUDED.areas_de_atuacao,
+            embeddings = CASE WHEN docentes.areas_de_atuacao IS DISTINCT FROM EXCLUDED.areas_de_atuacao
+                THEN EXCLUDED.embeddings ELSE COALESCE(EXCLUDED.embeddings, docentes.embeddings) END,
+            content_hash = COALESCE(EXCLUDED.content_hash, docentes.content_hash),
+            updated_at = now()
+            WHERE docentes.areas_de_atuacao IS DISTINCT FROM EXCLUDED.areas_de_atuacao
+            OR docentes.nome IS DISTINCT FROM EXCLUDED.nome
+            OR (docentes.embeddings IS NULL AND EXCLUDED.embeddings IS NOT NULL)
+            OR (EXCLUDED.content_hash IS NOT NULL AND docentes.content_hash IS DISTINCT FROM EXCLUDED.content_hash)
+            RETURNING professor_id, nome, areas_de_atuacao, embeddings, content_hash, xmax = 0 AS inserted
+        ), professors AS (
+            SELECT *, TRUE AS changed FROM upserted
+            UNION ALL
+            SELECT docentes.professor_id, docentes.nome, docentes.areas_de_atuacao, docentes.embeddings,
+            docentes.content_hash, FALSE, FALSE
+            FROM docentes JOIN incoming USING (catalog_key)
+            WHERE docentes.professor_id NOT IN (SELECT professor_id FROM upserted)
+        ), unlinked AS (
+            DELETE FROM docentes_usuarios USING docentes, professors
+            WHERE docentes_usuarios.user_id = :user_id
+            AND docentes_usuarios.professor_id = docentes.professor_id
+            AND docentes.nome = professors.nome AND docentes.professor_id <> professors.professor_id
+            RETURNING docentes_usuarios.professor_id
+        ), orphaned AS (
+            -- The statement sees the links as they were before unlinked, hence the user_id condition
+            DELETE FROM docentes WHERE professor_id IN (SELECT professor_id FROM unlinked)
+            AND NOT EXISTS (
+                SELECT 1 FROM docentes_usuarios
+                WHERE docentes_usuarios.professor_id = docentes.professor_id AND docentes_usuarios.user_id <> :user_id
+            )
+            RETURNING professor_id
+        ), linked AS (
+            INSERT INTO docentes_usuarios (user_id, professor_id)
+            SELECT :user_id, professor_id FROM professors
+            ON CONFLICT DO NOTHING
+            RETURNING professor_id
+        ), updated_user AS (
+            UPDATE users SET professores = ARRAY(
+                SELECT professor_id FROM docentes_usuarios
+                WHERE user_id = :user_id AND professor_id NOT IN (SELECT professor_id FROM unlinked)
+                UNION SELECT professor_id FROM professors
+            )
+            WHERE id = :user_id
+        )
+        SELECT professor_id, nome, areas_de_atuacao, embeddings, content_hash, inserted, changed, FALSE AS orphaned
+        FROM professors WHERE changed OR professor_id IN (SELECT professor_id FROM linked)
+        UNION ALL
+        SELECT professor_id, NULL, NULL, NULL, NULL, FALSE, FALSE, TRUE FROM orphaned;
+        """
+        with self._connect() as cursor:
+            rows = cursor.execute(text(query), params).fetchall()
             cursor.commit()
-        professors = self.connection.query(return_professors_query, params={"user_id": user_id})
+        # An explicit dtype, so the flags still filter rows when nothing changed and no row came back
+        professors = pd.DataFrame(rows, columns=columns + ["inserted", "changed", "orphaned"]).astype(
+            {"inserted": bool, "changed": bool, "orphaned": bool}
+        )
+        orphaned = professors.loc[professors["orphaned"], "professor_id"]
+        professors = professors[~professors["orphaned"]]
+        if (professors["changed"] & ~professors["inserted"]).any():
+            # Catalog rows shared with other users changed, their cached professors are stale
+            self._professors_cache.clear()
+        else:
+            self._professors_cache.invalidate(int(user_id))
         print(f"Teachers for {user_id} created")
-        return professors
+        if self.index is not None:
+            self._index_professors(professors[professors["changed"]])
+            for professor_id in orphaned:
+                self.index.remove(int(professor_id))
+        return professors[columns].reset_index(drop=True)
 
+    @metrics.timed("database.read_professor")
     def read_professor(self, user_id: Union[str, int]) -> Optional[pd.DataFrame]:
-        """Read professor in the database
+        """Read the professors linked to a user
 
         Args:
             user_id (Union[str, int]): user id
 
         Returns:
-            Optional[Tuple[int, str, List[str]]]: Tuple containing the professor's ID,
-            name and specialities, None if there's no professor.
-        """
-        query = """
-        SELECT professor_id, nome, areas_de_atuacao FROM docentes WHERE user_id = :user_id;
+            Optional[pd.DataFrame]: professor's ID, name, specialities, embeddings and resume
+            fingerprint of every professor, None if there's no professor.
         """
-        professor = self.connection.query(query, params={"user_id": user_id})
+        professor = self._professors_cache.get(int(user_id))
+        metrics.increment("cache_requests_total", cache="professors", result="miss" if professor is None else "hit")
+        if professor is None:
+            query = """
+            SELECT docentes.professor_id, nome, areas_de_atuacao, embeddings, content_hash
+            FROM docentes_usuarios JOIN docentes USING (professor_id)
+            WHERE docentes_usuarios.user_id = :user_id;
+            """
+            professor = self._query(query, {"user_id": int(user_id)})
+            self._professors_cache.set(int(user_id), professor)
         if not professor.empty:
             return professor
         return None
 
-    def delete_professor(self, professor_id: Union[str, int]) -> bool:
-        """Delete professor in the database
+    @metrics.timed("database.delete_professor")
+    def delete_professor(self, professor_id: Union[str, int], user_id: Union[str, int]) -> bool:
+        """Unlink a professor from a user, removing it from the catalog once no user is linked to it
 
         Args:
             professor_id (Union[str, int]): professor id
+            user_id (Union[str, int]): user id
 
         Returns:
             bool: True if deletion was successful, False otherwise
         """
-        query = "DELETE FROM docentes WHERE professor_id = :professor_id;"
-        with self.connection.session as cursor:
-            cursor.execute(text(query), {"professor_id": professor_id})
+        params = {"professor_id": int(professor_id), "user_id": int(user_id)}
+        unlink_query = """WITH unlinked AS (
+            DELETE FROM docentes_usuarios WHERE professor_id = :professor_id AND user_id = :user_id
+            RETURNING user_id
+        )
+        UPDATE users SET professores = array_remove(professores, :professor_id)
+        WHERE id IN (SELECT user_id FROM unlinked);
+        """
+        orphan_query = """DELETE FROM docentes WHERE professor_id = :professor_id
+        AND NOT EXISTS (SELECT 1 FROM docentes_usuarios WHERE professor_id = :professor_id)
+        RETURNING professor_id;
+        """
+        with self._connect() as cursor:
+            cursor.execute(text(unlink_query), params)
+            deleted = cursor.execute(text(orphan_query), params).fetchall()
+            cursor.commit()
+        self._professors_cache.invalidate(int(user_id))
+        if deleted and self.index is not None:
+            self.index.remove(int(professor_id))
+        return True
+
+    @metrics.timed("database.purge_professor")
+    def purge_professor(self, professor_id: Union[str, int]) -> bool:
+        """Remove a professor from the catalog, unlinking it from every user (administration only)
+
+        Args:
+            professor_id (Union[str, int]): professor id
+
+        Returns:
+            bool: True if the professor was in the catalog, False otherwise
+        """
+        query = """WITH purged AS (
+            DELETE FROM docentes WHERE professor_id = :professor_id RETURNING professor_id
+        ), updated_users AS (
+            UPDATE users SET professores = array_remove(professores, :professor_id)
+            WHERE id IN (SELECT user_id FROM docentes_usuarios WHERE professor_id = :professor_id)
+            RETURNING id
+        )
+        SELECT (SELECT count(*) FROM purged) > 0, ARRAY(SELECT id FROM updated_users);
+        """
+        with self._connect() as cursor:
+            purged, user_ids = cursor.execute(text(query), {"professor_id": int(professor_id)}).one()
+            cursor.commit()
+        for user_id in user_ids:
+            self._professors_cache.invalidate(user_id)
+        if purged and self.index is not None:
+            self.index.remove(int(professor_id))
+        return purged
+
+    @metrics.timed("database.create_ingest_job")
+    def create_ingest_job(
+        self, user_id: Union[str, int], files: List[Tuple[str, bytes]], tema: Optional[str] = None,
+        max_queued: Optional[int] = None,
+    ) -> Optional[int]:
+        """Queue the ingestion of uploaded resumes
+
+        Args:
+            user_id (Union[str, int]): user id
+            files (List[Tuple[str, bytes]]): name and content of every uploaded file
+            tema (Optional[str]): TCC theme the professors will be ranked for once stored
+            max_queued (Optional[int]): jobs waiting in the queue beyond which the job is refused, no limit if None
+
+        Returns:
+            Optional[int]: job id, None if the queue is full
+        """
+        job_query = """INSERT INTO ingest_jobs (user_id, tema, files_total)
+        SELECT :user_id, :tema, :files_total
+        WHERE CAST(:max_queued AS integer) IS NULL
+        OR (SELECT count(*) FROM ingest_jobs WHERE status = 'queued') < :max_queued
+        RETURNING job_id;
+        """
+        files_query = """INSERT INTO ingest_job_files (job_id, file_name, content)
+        SELECT :job_id, file_name, content
+        FROM unnest(CAST(:file_names AS text[]), CAST(:contents AS bytea[])) AS files (file_name, content);
+        """
+        params = {"user_id": int(user_id), "tema": tema, "files_total": len(files), "max_queued": max_queued}
+        with self._connect() as cursor:
+            # Serializes the submissions, so concurrent ones can't overflow the queue
+            cursor.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": INGEST_QUEUE_LOCK_KEY})
+            job_id = cursor.execute(text(job_query), params).scalar()
+            if job_id is not None:
+                cursor.execute(
+                    text(files_query),
+                    {
+                        "job_id": job_id,
+                        "file_names": [file_name for file_name, _ in files],
+                        "contents": [content for _, content in files],
+                    },
+                )
+            cursor.commit()
+        return job_id
+
+    @metrics.timed("database.claim_ingest_job")
+    def claim_ingest_job(self, stale_after: float) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job, or a running one whose worker stopped reporting progress
+
+        Args:
+            stale_after (float): seconds without a heartbeat after which a running job is taken over
+
+        Returns:
+            Optional[Dict[str, Any]]: job_id, user_id and attempts of the claimed job, None if there's none
+        """
+        query = """UPDATE ingest_jobs SET status = 'running', started_at = COALESCE(started_at, now()),
+        heartbeat_at = now(), attempts = attempts + 1
+        WHERE job_id = (
+            SELECT job_id FROM ingest_jobs
+            WHERE status = 'queued'
+            OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => :stale_after))
+            ORDER BY job_id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING job_id, user_id, attempts;
+        """
+        with self._connect() as cursor:
+            job = cursor.execute(text(query), {"stale_after": stale_after}).mappings().first()
+            cursor.commit()
+        return dict(job) if job is not None else None
+
+    @metrics.timed("database.read_ingest_files")
+    def read_ingest_files(self, job_id: int, limit: int) -> pd.DataFrame:
+        """Read the next files of a job not stored yet
+
+        Args:
+            job_id (int): job id
+            limit (int): maximum number of files
+
+        Returns:
+            pd.DataFrame: file_id, file_name and content of the files, in upload order
+        """
+        query = """SELECT file_id, file_name, content FROM ingest_job_files
+        WHERE job_id = :job_id AND NOT done ORDER BY file_id LIMIT :limit;
+        """
+        return self._query(query, {"job_id": job_id, "limit": limit})
+
+    @metrics.timed("database.update_ingest_job")
+    def update_ingest_job(
+        self, job_id: int, stage: Optional[str] = None, file_ids: Optional[List[int]] = None, professors: int = 0,
+        skipped: int = 0, errors: Optional[List[str]] = None,
+    ) -> None:
+        """Report a job's progress, which also serves as the heartbeat of its worker
+
+        Args:
+            job_id (int): job id
+            stage (Optional[str]): step being run, unchanged if None
+            file_ids (Optional[List[int]]): files just stored, whose content is dropped
+            professors (int): professors just stored
+            skipped (int): files just skipped because they were unchanged
+            errors (Optional[List[str]]): messages of the files that couldn't be read
+        """
+        job_query = """UPDATE ingest_jobs SET heartbeat_at = now(), stage = COALESCE(:stage, stage),
+        files_done = files_done + :files_done, professors = professors + :professors, skipped = skipped + :skipped,
+        errors = errors || CAST(:errors AS text[])
+        WHERE job_id = :job_id;
+        """
+        files_query = """UPDATE ingest_job_files SET done = TRUE, content = NULL
+        WHERE job_id = :job_id AND file_id = ANY(CAST(:file_ids AS integer[]));
+        """
+        file_ids = file_ids or []
+        params = {
+            "job_id": job_id,
+            "stage": stage,
+            "file_ids": file_ids,
+            "files_done": len(file_ids),
+            "professors": professors,
+            "skipped": skipped,
+            "errors": errors or [],
+        }
+        with self._connect() as cursor:
+            cursor.execute(text(job_query), params)
+            if file_ids:
+                cursor.execute(text(files_query), params)
+            cursor.commit()
+
+    @metrics.timed("database.finish_ingest_job")
+    def finish_ingest_job(self, job_id: int, message: Optional[str] = None) -> None:
+        """Mark a job as done, or as failed with the error message
+
+        Args:
+            job_id (int): job id
+            message (Optional[str]): error message, None if the job succeeded
+        """
+        query = """UPDATE ingest_jobs
+        SET status = CASE WHEN CAST(:message AS text) IS NULL THEN 'done' ELSE 'failed' END, message = :message,
+        stage = NULL, finished_at = now(), heartbeat_at = now()
+        WHERE job_id = :job_id;
+        """
+        with self._connect() as cursor:
+            cursor.execute(text(query), {"job_id": job_id, "message": message})
+            # Files of a failed job won't be read again
+            cursor.execute(
+                text("UPDATE ingest_job_files SET content = NULL WHERE job_id = :job_id AND content IS NOT NULL"),
+                {"job_id": job_id},
+            )
             cursor.commit()
-            return True
+
+    @metrics.timed("database.read_ingest_jobs")
+    def read_ingest_jobs(
+        self, user_id: Union[str, int], job_id: Optional[int] = None, active: bool = False
+    ) -> pd.DataFrame:
+        """Read a user's ingestion jobs, newest first
+
+        Args:
+            user_id (Union[str, int]): user id
+            job_id (Optional[int]): only this job, every job of the user if None
+            active (bool): only the queued and running jobs
+
+        Returns:
+            pd.DataFrame: job_id, status, stage, tema, progress counters, errors, message and timestamps
+        """
+        query = """SELECT job_id, status, stage, tema, files_total, files_done, professors, skipped, errors, message,
+        created_at, finished_at
+        FROM ingest_jobs
+        WHERE user_id = :user_id
+        AND (CAST(:job_id AS integer) IS NULL OR job_id = :job_id)
+        AND (NOT :active OR status IN ('queued', 'running'))
+        ORDER BY job_id DESC;
+        """
+        return self._query(query, {"user_id": int(user_id), "job_id": job_id, "active": active})
+
+    @metrics.timed("database.purge_ingest_jobs")
+    def purge_ingest_jobs(self, older_than: float) -> int:
+        """Delete the finished jobs (and their files) older than a given age
+
+        Args:
+            older_than (float): age in seconds
+
+        Returns:
+            int: number of jobs deleted
+        """
+        query = """DELETE FROM ingest_jobs
+        WHERE status IN ('done', 'failed') AND finished_at < now() - make_interval(secs => :older_than);
+        """
+        with self._connect() as cursor:
+            deleted = cursor.execute(text(query), {"older_than": older_than}).rowcount
+            cursor.commit()
+        return deleted
+
+    def _index_professors(self, professors: pd.DataFrame, index: Optional["IVFIndex"] = None) -> None:
+        """Add the professors embeddings to the index, dropping the ones stored without embeddings
+
+        Args:
+            professors (pd.DataFrame): professors with professor_id, areas_de_atuacao and embeddings columns
+            index (Optional[IVFIndex]): index to update, the database's one if None
+        """
+        index = index if index is not None else self.index
+        items = []
+        for professor_id, areas, embeddings in professors[["professor_id", "areas_de_atuacao", "embeddings"]].itertuples(
+            index=False
+        ):
+            matrix = unpack_embeddings(embeddings, len(areas))
+            if matrix is None:
+                index.remove(int(professor_id))
+            else:
+                items.append((int(professor_id), matrix))
+        index.add_many(items)
+
+    @metrics.timed("database.sync_index")
+    def sync_index(self, index: "IVFIndex") -> bool:
+        """Bring an index up to date with the catalog, filling it when it's new
+
+        A saved index may miss the last writes before the process stopped (see
+        IVFIndex.save_every): the rows changed since its synced_at are indexed again and
+        the professors deleted (or stored without embeddings) since are removed.
+
+        Args:
+            index (IVFIndex): index to update, whose synced_at is advanced
+
+        Returns:
+            bool: True if the index changed
+        """
+        with self._connect() as cursor:
+            synced_at = float(cursor.execute(text("SELECT extract(epoch FROM now())")).scalar())
+        updated_after = None if index.synced_at is None else index.synced_at - INDEX_SYNC_OVERLAP
+        indexed = index.professor_ids()
+        changed = False
+        for professors in self.iter_embeddings(updated_after=updated_after):
+            self._index_professors(professors, index)
+            changed = True
+        if indexed:
+            stored = self._query("SELECT professor_id FROM docentes WHERE embeddings IS NOT NULL")
+            for professor_id in indexed - set(stored["professor_id"].astype(int)):
+                index.remove(professor_id)
+                changed = True
+        index.synced_at = synced_at
+        return changed
+
+    def iter_embeddings(self, page_size: int = 1000, updated_after: Optional[float] = None) -> Iterator[pd.DataFrame]:
+        """Stream the stored professor embeddings page by page
+
+        Args:
+            page_size (int): number of professors per page
+            updated_after (Optional[float]): only the rows changed after this epoch time, every row if None
+
+        Returns:
+            Iterator[pd.DataFrame]: professor_id, areas_de_atuacao and embeddings pages
+        """
+        query = """SELECT professor_id, areas_de_atuacao, embeddings FROM docentes
+        WHERE professor_id > :after_id AND embeddings IS NOT NULL
+        AND (CAST(:updated_after AS double precision) IS NULL OR updated_at > to_timestamp(:updated_after))
+        ORDER BY professor_id LIMIT :limit;
+        """
+        after_id = 0
+        while True:
+            professors = self._query(
+                query, {"after_id": after_id, "limit": page_size, "updated_after": updated_after}
+            )
+            if professors.empty:
+                return
+            yield professors
+            after_id = int(professors["professor_id"].iloc[-1])
@@ -0,0 +1,86 @@
+"""Packing and vectorized scoring of speciality embeddings"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length so cosine similarity becomes a dot product
+
+    Args:
+        vectors (np.ndarray): 2D array of embeddings
+
+    Returns:
+        np.ndarray: float32 array with unit length rows
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def pack_embeddings(vectors: np.ndarray) -> bytes:
+    """Pack a matrix of embeddings as little-endian float32 bytes
+
+    Args:
+        vectors (np.ndarray): one row per speciality
+
+    Returns:
+        bytes: packed embeddings
+    """
+    return np.ascontiguousarray(vectors, dtype="<f4").tobytes()
+
+
+def unpack_embeddings(packed: Optional[bytes], rows: int) -> Optional[np.ndarray]:
+    """Unpack embeddings stored by pack_embeddings
+
+    Args:
+        packed (Optional[bytes]): packed embeddings (bytes or memoryview)
+        rows (int): number of specialities packed
+
+    Returns:
+        Optional[np.ndarray]: (rows, dim) float32 matrix, None if there's nothing stored
+    """
+    if packed is None or rows == 0:
+        return None
+    vectors = np.frombuffer(packed, dtype="<f4")
+    if vectors.size % rows:
+        return None
+    return vectors.reshape(rows, -1)
+
+
+def grouped_max_scores(theme: np.ndarray, matrices: Sequence[np.ndarray]) -> List[float]:
+    """Score a theme against every professor's specialities in a single matrix-vector product
+
+    Args:
+        theme (np.ndarray): unit length theme embedding
+        matrices (Sequence[np.ndarray]): unit length speciality embeddings, one matrix per professor
+
+    Returns:
+        List[float]: highest cosine similarity for every professor
+    """
+    if not matrices:
+        return []
+    areas = np.concatenate(matrices, axis=0)
+    offsets = np.cumsum([0] + [len(matrix) for matrix in matrices[:-1]])
+    scores = areas @ np.asarray(theme, dtype=np.float32)
+    return np.maximum.reduceat(scores, offsets).tolist()
+
+
+def grouped_max_score_matrix(themes: np.ndarray, matrices: Sequence[np.ndarray]) -> np.ndarray:
+    """Score several themes against every professor's specialities in a single matrix product
+
+    Args:
+        themes (np.ndarray): unit length theme embeddings, one per row
+        matrices (Sequence[np.ndarray]): unit length speciality embeddings, one matrix per professor
+
+    Returns:
+        np.ndarray: (themes, professors) matrix with the highest cosine similarity of every pair
+    """
+    themes = np.asarray(themes, dtype=np.float32)
+    if not matrices:
+        return np.zeros((len(themes), 0), dtype=np.float32)
+    areas = np.concatenate(matrices, axis=0)
+    offsets = np.cumsum([0] + [len(matrix) for matrix in matrices[:-1]])
+    return np.maximum.reduceat(themes @ areas.T, offsets, axis=1)
@@ -0,0 +1,213 @@
+"""Resumes parsing and professors ranking, shared by the Streamlit page and the batch CLI"""
+
+import hashlib
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.lattes import BulkParseResult, parse_resumes_bulk
+from src.metrics import metrics
+
+if TYPE_CHECKING:
+    from src.cache import ResultCache
+    from src.scoring import ScoringBackend
+
+
+class ResumesFacade:
+    """Class to perform parsing and similarity calculation with resumes"""
+
+    def __init__(
+        self, db, backend: "ScoringBackend", ingest_pool: Optional[Executor] = None,
+        result_cache: Optional["ResultCache"] = None,
+    ):
+        self.db = db
+        self.backend = backend
+        self.ingest_pool = ingest_pool
+        self.result_cache = result_cache
+
+    def validate_theme_and_resumes(
+        self, tcc_theme: Optional[str], resumes: Optional[List[BinaryIO]], professors: Optional[pd.DataFrame]
+    ) -> Optional[str]:
+        """Validate if the theme and resumes are None
+
+        Args:
+            tcc_theme (Optional[str]): TCC theme
+            resumes (Optional[List[BinaryIO]]): List of resumes
+            professors (Optional[pd.DataFrame]): professors already registered by the user
+
+        Returns:
+            Optional[str]: warning to show, None if theme and resumes are valid.
+        """
+        if not tcc_theme:
+            return ":warning: Tema do TCC não pode ser em branco."
+        if professors is None and not resumes:
+            return ":warning: É necessário fazer o upload de pelo menos 1 currículo."
+        return None
+
+    def parse_resume(
+        self, resumes: Optional[List[BinaryIO]], known_fingerprints: Optional[Set[str]] = None
+    ) -> BulkParseResult:
+        """Parse the XML resumes (or zip archives of them), get the specialities for every professor
+
+        Several files are parsed in the ingest process pool, a single XML is parsed in place.
+        Resumes whose fingerprint is already stored are skipped.
+
+        Args:
+            resumes (List[BinaryIO]): professors's resumes, binary files with a name attribute
+            known_fingerprints (Optional[Set[str]]): fingerprints of the user's stored resumes
+
+        Returns:
+            BulkParseResult: Dict containing the professor's name with his specialities, their
+            fingerprints and Lattes ids, the name and error of every file that couldn't be parsed
+            and the number of unchanged files skipped.
+        """
+        if not resumes:
+            return BulkParseResult({}, {}, {}, [], 0)
+        bulk = len(resumes) > 1 or resumes[0].name.lower().endswith(".zip")
+        executor = self.ingest_pool if bulk else None
+        with metrics.span("resumes.parse"):
+            return parse_resumes_bulk(
+                ((resume.name, resume) for resume in resumes), executor, known_fingerprints=known_fingerprints
+            )
+
+    def embed_professors(self, professors: Optional[Dict[str, List[str]]]) -> Dict[str, bytes]:
+        """Compute what the scoring backend stores next to every professor at ingest time
+
+        Args:
+            professors (Optional[Dict[str, List[str]]]): professors's names and specialities
+
+        Returns:
+            Dict[str, bytes]: packed float32 embeddings (one row per speciality) by professor's name
+        """
+        if not professors:
+            return {}
+        with metrics.span("resumes.embed"):
+            return self.backend.prepare(professors)
+
+    @staticmethod
+    def scores_frame(scores: Dict[str, float]) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Build the scores table shown to the user
+
+        Args:
+            scores (Dict[str, float]): similarity, between 0 and 1, by professor's name
+
+        Returns:
+            Tuple[pd.DataFrame, np.ndarray]: Score (0 to 100) indexed by Professor, and the best professors
+        """
+        professors_scores = pd.DataFrame.from_dict(
+            {nome: score * 100 for nome, score in scores.items()}, orient="index", columns=["Score"]
+        )
+        professors_scores.index.name = "Professor"
+        melhor_professor = professors_scores[professors_scores["Score"] == professors_scores["Score"].max()].index.values
+        return professors_scores, melhor_professor
+
+    @staticmethod
+    def professors_version(professors: pd.DataFrame) -> str:
+        """Version of a professors set, which changes whenever a professor is added, deleted or re-uploaded
+
+        Names and specialities are hashed as well: content_hash is NULL for professors
+        stored without a resume fingerprint, whose rows are updated in place.
+
+        Args:
+            professors (pd.DataFrame): professors with professor_id, nome, areas_de_atuacao, embeddings
+                and, optionally, content_hash columns
+
+        Returns:
+            str: hex digest, independent of the rows order
+        """
+        order = np.argsort(professors["professor_id"].to_numpy(), kind="stable")
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(professors["professor_id"].to_numpy(np.int64)[order].tobytes())
+        digest.update(professors["embeddings"].notna().to_numpy()[order].tobytes())
+        content_hashes = professors["content_hash"] if "content_hash" in professors else [None] * len(professors)
+        rows = list(zip(professors["nome"], professors["areas_de_atuacao"], content_hashes))
+        for index in order:
+            nome, areas, content_hash = rows[index]
+            specialities = "\x1e".join(map(str, areas))
+            digest.update(f"{nome}\x1d{specialities}\x1d{content_hash}\x1f".encode())
+        return digest.hexdigest()
+
+    def calculate_similarity(
+        self, professors: pd.DataFrame, tcc_theme: str, top_k: Optional[int] = None
+    ) -> Tuple[pd.DataFrame, np.ndarray, bool]:
+        """Calculate similarity between professors's and TCC theme strings.
+
+        Each professor gets the highest score among his specialities. Rankings are served
+        from the result cache, when there's one, for a theme folded to the same text and
+        the same professors set.
+
+        Args:
+            professors (pd.DataFrame): professors's names and specialities
+            tcc_theme (str): TCC theme
+            top_k (Optional[int]): only the top_k most similar professors are ranked, all of them if None
+
+        Raises:
+            ConnectionRefusedError: if the scoring backend is unavailable
+
+        Returns:
+            Tuple[pd.DataFrame, np.ndarray, bool]: Score (0 to 100) indexed by Professor, the best professors,
+                and whether the scoring backend fell back to keywords
+        """
+        version = None
+        if self.result_cache is not None and not professors.empty:
+            version = self.professors_version(professors)
+            if top_k is not None:
+                version = f"{version}:top{top_k}"
+            cached = self.result_cache.get(tcc_theme, version)
+            metrics.increment("cache_requests_total", cache="results", result="miss" if cached is None else "hit")
+            if cached is not None:
+                return (*cached, False)
+        scores, used_fallback = {}, False
+        if not professors.empty:
+            with metrics.span("resumes.score"):
+                scores, used_fallback = self.backend.score_with_fallback(professors, tcc_theme, top_k)
+        professors_scores, melhor_professor = self.scores_frame(scores)
+        # Keyword scores stand in while the model is down, they aren't kept
+        if version is not None and not used_fallback:
+            self.result_cache.set(tcc_theme, version, professors_scores, melhor_professor)
+        return professors_scores, melhor_professor, used_fallback
+
+    def rank_themes(
+        self, professors: pd.DataFrame, themes: List[str], k: int = 10, chunk_size: int = 64
+    ) -> Iterator[Tuple[pd.DataFrame, bool]]:
+        """Rank the professors for several themes, a chunk of themes at a time
+
+        Every chunk is scored against every professor in a single matrix product, so
+        memory is bounded by chunk_size x number of specialities.
+
+        Args:
+            professors (pd.DataFrame): professors with nome, areas_de_atuacao and embeddings columns
+            themes (List[str]): TCC themes
+            k (int): number of professors kept per theme
+            chunk_size (int): number of themes scored at a time
+
+        Raises:
+            ConnectionRefusedError: if the scoring backend is unavailable
+
+        Returns:
+            Iterator[Tuple[pd.DataFrame, bool]]: Tema (position in themes), Posição, Professor and Score (0 to 100)
+                rows of every chunk, and whether the scoring backend fell back to keywords for it
+        """
+        names = np.asarray(professors["nome"], dtype=object)
+        k = min(k, len(names))
+        for start in range(0, len(themes), chunk_size):
+            chunk = themes[start:start + chunk_size]
+            if k == 0:
+                continue
+            with metrics.span("resumes.rank"):
+                scores, used_fallback = self.backend.score_many_with_fallback(professors, chunk)
+            scores = np.nan_to_num(scores, nan=-np.inf)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            ranked = pd.DataFrame({
+                "Tema": np.repeat(np.arange(start, start + len(chunk)), k),
+                "Posição": np.tile(np.arange(1, k + 1), len(chunk)),
+                "Professor": names[top.ravel()],
+                "Score": top_scores.ravel() * 100,
+            })
+            yield ranked[np.isfinite(ranked["Score"])], used_fallback
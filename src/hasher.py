@@ -1,15 +1,60 @@
 """Hash module to hash and check passwords"""
 
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
 import bcrypt
 
+T = TypeVar("T")
+
 
 class Hasher:
     """Contains the methods to hash passwords and check if two hashed
     passwords are the same
+
+    bcrypt runs in a bounded worker pool, so a burst of logins can't take
+    every CPU away from the other sessions.
     """
 
-    @staticmethod
-    def hash_pw(password: str) -> str:
+    def __init__(self, rounds: int = 12, max_workers: int = 2, max_pending: int = 64, samples: int = 1024):
+        """Initialize the worker pool
+
+        Args:
+            rounds (int): bcrypt cost of new hashes
+            max_workers (int): maximum number of hashes computed at the same time
+            max_pending (int): maximum number of hashes queued or running, callers block above it
+            samples (int): number of recent queue waits kept for the metrics
+        """
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hasher")
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._waits = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def _run(self, func: Callable[..., T], *args) -> T:
+        """Run a bcrypt call in the worker pool, recording how long it waited in the queue
+
+        Args:
+            func (Callable[..., T]): bcrypt function
+            args: function arguments
+
+        Returns:
+            T: function result
+        """
+        submitted = time.perf_counter()
+
+        def task() -> T:
+            with self._lock:
+                self._waits.append(time.perf_counter() - submitted)
+            return func(*args)
+
+        with self._pending:
+            return self._executor.submit(task).result()
+
+    def hash_pw(self, password: str) -> str:
         """Hash the password
 
         Args:
@@ -18,10 +63,9 @@ class Hasher:
         Returns:
             str: hashed password
         """
-        return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        return self._run(bcrypt.hashpw, password.encode(), bcrypt.gensalt(self.rounds)).decode()
 
-    @staticmethod
-    def check_pw(hashed_pw: str, input_pw: str) -> bool:
+    def check_pw(self, hashed_pw: str, input_pw: str) -> bool:
         """Check if the passwords match
 
         Args:
@@ -31,4 +75,32 @@ class Hasher:
         Returns:
             bool: True if passwords match, False otherwise
         """
-        return bcrypt.checkpw(input_pw.encode(), hashed_pw.encode())
+        return self._run(bcrypt.checkpw, input_pw.encode(), hashed_pw.encode())
+
+    def needs_rehash(self, hashed_pw: str) -> bool:
+        """Check if a hash was made with a cost other than the configured one
+
+        Args:
+            hashed_pw (str): hashed password in the database
+
+        Returns:
+            bool: True if the password should be hashed again
+        """
+        try:
+            return int(hashed_pw.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Queue wait percentiles, in milliseconds, of the recent hashes"""
+        with self._lock:
+            waits = sorted(self._waits)
+        if not waits:
+            return {"samples": 0, "wait_p50_ms": 0.0, "wait_p99_ms": 0.0, "wait_max_ms": 0.0}
+        return {
+            "samples": len(waits),
+            "wait_p50_ms": waits[len(waits) // 2] * 1000,
+            "wait_p99_ms": waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000,
+            "wait_max_ms": waits[-1] * 1000,
+        }
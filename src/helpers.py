@@ -1,9 +1,28 @@
 """Helpers functions"""
 
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
 import streamlit as st
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
 from streamlit_cookies_manager import EncryptedCookieManager
 
+from src.cache import LRUCache, PersistentCache, ResultCache, SimilarityCache
 from src.database import Database
+from src.hasher import Hasher
+from src.metrics import Metrics, metrics
+from src.migrations import apply_migrations
+
+if TYPE_CHECKING:
+    # The scoring stack is imported by the factories that need it, so the login and register pages don't load it
+    from src.ann import IVFIndex
+    from src.jobs import IngestQueue
+    from src.model_client import ModelClient
+    from src.scoring import LexicalBackend, ScoringBackend
 
 def fetch_cookies():
     """Fetch the stored cookies"""
@@ -13,9 +32,204 @@ def fetch_cookies():
         st.stop()
     return cookies
 
-def setup_database_connection():
-    """Instantiate database connection"""
+@st.cache_resource
+def get_database() -> Database:
+    """Create the database and its connection pool, shared by every session of the process"""
+    config = st.secrets.connections.postgresql
+    if "url" in config:
+        url = make_url(config.url)
+    else:
+        url = URL.create(
+            drivername=f"{config.get('dialect', 'postgresql')}+{config.get('driver', 'psycopg2')}",
+            username=config.get("username"),
+            password=config.get("password"),
+            host=config.get("host"),
+            port=config.get("port"),
+            database=config.get("database"),
+        )
+    pool = st.secrets.get("database_pool", {})
+    engine = create_engine(
+        url,
+        pool_size=pool.get("size", 10),
+        max_overflow=pool.get("max_overflow", 20),
+        pool_timeout=pool.get("timeout", 30),
+        pool_recycle=pool.get("recycle", 1800),
+        pool_pre_ping=pool.get("pre_ping", True),
+    )
+    db = Database(engine, cache_ttl=st.secrets.get("database_cache_ttl", 300))
+    if st.secrets.get("run_migrations", True):
+        apply_migrations(engine)
+    return db
+
+
+@st.cache_resource
+def get_ann_index() -> "IVFIndex":
+    """Load the embeddings index, and keep it in sync with the database's professors writes from then on
+
+    It's loaded by the scoring backend and the ingestion queue (the only writer of
+    professors), so the login and register pages neither load nor build it.
+    """
+    db = get_database()
+    db.index = load_ann_index(db)
+    return db.index
+
+
+def load_ann_index(db: Database) -> "IVFIndex":
+    """Load the embeddings index from disk, building it from the database when there's no saved one
+
+    The index is saved every save_every professors writes and when the process exits, and
+    brought up to date with the database when it's loaded.
+    """
+    from src.ann import IVFIndex
+
+    config = st.secrets.get("ann_index", {})
+    path = config.get("path", ".cache/ann_index.npz")
+    save_every = config.get("save_every", 256)
+    if os.path.exists(path):
+        index = IVFIndex.load(path, save_every=save_every)
+    else:
+        index = IVFIndex(
+            n_lists=config.get("n_lists", 256),
+            n_probe=config.get("n_probe", 16),
+            train_size=config.get("train_size", 20_000),
+            save_every=save_every,
+        )
+    # A saved index may miss the writes of a process that stopped before saving them
+    db.sync_index(index)
+    index.save(path)
+    index.path = path
+    atexit.register(index.flush)
+    return index
+
+
+@st.cache_resource
+def get_similarity_cache() -> SimilarityCache:
+    """Create the similarity cache shared by every session"""
+    config = st.secrets.get("similarity_cache", {})
+    ttl = config.get("ttl", 30 * 24 * 60 * 60)
+    memory = LRUCache(max_entries=config.get("memory_entries", 10_000), ttl=ttl)
+    disk = PersistentCache(
+        config.get("path", ".cache/similarity.sqlite3"),
+        max_entries=config.get("disk_entries", 1_000_000),
+        ttl=ttl,
+    )
+    return SimilarityCache(memory, disk)
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Create the theme rankings cache shared by every session"""
+    config = st.secrets.get("result_cache", {})
+    return ResultCache(
+        max_entries=config.get("max_entries", 1024), max_bytes=config.get("max_mb", 64) * 1024 * 1024
+    )
+
+
+@st.cache_resource
+def get_model_client() -> "ModelClient":
+    """Create the model client (and its connection pool) shared by every session"""
+    # Imported here so that requests is only loaded once a page scores professors
+    from src.model_client import ModelClient
+
+    config = st.secrets.get("model_client", {})
+    return ModelClient(headers={"Authorization": f"Bearer {st.secrets.api_token}"}, **config)
+
+
+@st.cache_resource
+def get_ingest_pool() -> ProcessPoolExecutor:
+    """Create the process pool used to parse resumes, shared by every session"""
+    workers = st.secrets.get("ingest_workers", os.cpu_count() or 1)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+@st.cache_resource
+def get_ingest_queue() -> "IngestQueue":
+    """Create the background ingestion queue, and start its workers, shared by every session
+
+    The [ingest_queue] secrets section sets workers (jobs run at the same time),
+    queue_depth (waiting jobs beyond which uploads are refused), chunk_size (files
+    stored at a time), stale_after (seconds before an abandoned job is taken over)
+    and retention_days (how long finished jobs are kept).
+    """
+    from src.facade import ResumesFacade
+    from src.jobs import IngestQueue
+
+    config = st.secrets.get("ingest_queue", {})
+    db = get_database()
+    get_ann_index()
+    db.purge_ingest_jobs(config.get("retention_days", 7) * 24 * 60 * 60)
+    facade = ResumesFacade(db, get_scoring_backend(), ingest_pool=get_ingest_pool())
+    return IngestQueue(
+        facade,
+        workers=config.get("workers", 1),
+        max_queued=config.get("queue_depth", 16),
+        chunk_size=config.get("chunk_size", 16),
+        stale_after=config.get("stale_after", 300),
+    ).start()
+
+
+@st.cache_resource
+def get_hasher() -> Hasher:
+    """Create the password hasher (and its worker pool) shared by every session"""
+    return Hasher(**st.secrets.get("hasher", {}))
+
+
+@st.cache_resource
+def get_lexical_backend() -> "LexicalBackend":
+    """Create the offline scoring backend, whose indexes are shared by every session"""
+    from src.scoring import LexicalBackend
+
+    return LexicalBackend()
+
+
+def get_scoring_backend() -> "ScoringBackend":
+    """Build the scoring backend chosen by the scoring_backend secret
+
+    "remote" uses only the model, "lexical" only the offline scorer and "auto"
+    (the default) the model, falling back to the offline scorer when it's unavailable.
+    """
+    from src.scoring import API_URL, EMBEDDING_URL, FallbackBackend, RemoteBackend
+
+    mode = st.secrets.get("scoring_backend", "auto")
+    if mode == "lexical":
+        return get_lexical_backend()
+    remote = RemoteBackend(
+        get_model_client(),
+        API_URL,
+        embedding_url=EMBEDDING_URL,
+        max_batch_size=st.secrets.get("similarity_batch_size", 64),
+        cache=get_similarity_cache(),
+        deadline=st.secrets.get("ranking_deadline", 20),
+        index=get_ann_index(),
+        index_threshold=st.secrets.get("ann_index", {}).get("threshold", 5000),
+    )
+    if mode == "remote":
+        return remote
+    return FallbackBackend(remote, get_lexical_backend())
+
+
+@st.cache_resource
+def get_metrics() -> Metrics:
+    """Configure the process wide metrics from the [metrics] secrets section
+
+    enabled turns the recording on, port serves /metrics (Prometheus) and
+    /metrics.json on the loopback interface (or on host, when set) and
+    timings_panel shows the spans of every ranking in the app.
+    """
+    config = st.secrets.get("metrics", {})
+    metrics.enabled = config.get("enabled", False)
+    if metrics.enabled:
+        db = get_database()
+        metrics.register_collector("database_cache", lambda: db.cache_stats)
+        metrics.register_collector("database_pool", lambda: db.pool_stats)
+        metrics.register_collector("similarity_cache", lambda: get_similarity_cache().stats)
+        metrics.register_collector("result_cache", lambda: get_result_cache().stats)
+        metrics.register_collector("hasher", lambda: get_hasher().stats)
+        if "port" in config:
+            metrics.serve(config.port, config.get("host", "127.0.0.1"))
+    return metrics
+
 
-    db = Database()
-    if "db_connection" not in st.session_state:
-        st.session_state["db_connection"] = db
\ No newline at end of file
+def show_timings_panel() -> bool:
+    """Whether the spans of every ranking are shown in the app"""
+    return get_metrics().enabled and st.secrets.get("metrics", {}).get("timings_panel", False)
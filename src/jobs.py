@@ -0,0 +1,180 @@
+"""Background ingestion of uploaded resumes
+
+Uploads are stored as jobs in Postgres (see migration 0006) and processed by a
+small pool of worker threads, a few files at a time: parse, embed the new
+professors and store them. The progress of every chunk is committed, so a job
+survives reruns and browser disconnections, and a job left running by a stopped
+process is taken over by another worker, resuming from its first pending file.
+"""
+
+import io
+import threading
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from src.metrics import metrics
+
+if TYPE_CHECKING:
+    from src.facade import ResumesFacade
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the ingestion queue already holds as many jobs as it accepts"""
+
+
+class IngestQueue:
+    """Postgres backed queue of resumes uploads, shared by every session of the process"""
+
+    def __init__(
+        self,
+        facade: "ResumesFacade",
+        workers: int = 1,
+        max_queued: Optional[int] = 16,
+        chunk_size: int = 16,
+        poll_interval: float = 5.0,
+        stale_after: float = 300.0,
+        max_attempts: int = 3,
+    ):
+        """Initialize the queue, without starting its workers
+
+        Args:
+            facade (ResumesFacade): facade (with its database and scoring backend) the jobs are run with
+            workers (int): jobs run at the same time, so ingestion can't take every connection and model slot
+            max_queued (Optional[int]): jobs waiting in the queue (of every process) beyond which uploads are refused
+            chunk_size (int): files parsed, embedded and stored at a time
+            poll_interval (float): seconds an idle worker waits before looking for jobs queued by other processes
+            stale_after (float): seconds without progress after which a running job is considered abandoned
+            max_attempts (int): times a job is taken over before it's marked as failed
+        """
+        self.facade = facade
+        self.db = facade.db
+        self.workers = workers
+        self.max_queued = max_queued
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Semaphore(0)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "IngestQueue":
+        """Start the worker threads"""
+        for number in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._work, name=f"ingest-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers once their current chunk is stored, unfinished jobs are resumed later"""
+        self._stop.set()
+        for _ in self._threads:
+            self._wakeup.release()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, user_id: Union[str, int], files: List[Tuple[str, bytes]], tema: Optional[str] = None) -> int:
+        """Queue the ingestion of uploaded resumes
+
+        Args:
+            user_id (Union[str, int]): user id
+            files (List[Tuple[str, bytes]]): name and content of every uploaded file
+            tema (Optional[str]): TCC theme the professors will be ranked for once stored
+
+        Raises:
+            QueueFullError: if max_queued jobs are already waiting
+
+        Returns:
+            int: job id
+        """
+        job_id = self.db.create_ingest_job(user_id, files, tema, self.max_queued)
+        if job_id is None:
+            metrics.increment("ingest_jobs_total", result="rejected")
+            raise QueueFullError(f"Fila de processamento cheia ({self.max_queued} envios aguardando)")
+        metrics.increment("ingest_jobs_total", result="queued")
+        self._wakeup.release()
+        return job_id
+
+    def _work(self) -> None:
+        """Worker loop: run jobs until there's none left, then wait for a submission"""
+        while not self._stop.is_set():
+            try:
+                job = self.db.claim_ingest_job(self.stale_after)
+                if job is None:
+                    self._wakeup.acquire(timeout=self.poll_interval)
+                elif job["attempts"] > self.max_attempts:
+                    self.db.finish_ingest_job(job["job_id"], "O processamento foi interrompido vezes demais.")
+                else:
+                    self.run(job["job_id"], job["user_id"])
+            except Exception as e:
+                # e.g. the database is unreachable, the job is taken over once it's back
+                print(f"Ingestion worker error: {e!r}")
+                self._stop.wait(self.poll_interval)
+
+    def run(self, job_id: int, user_id: int) -> None:
+        """Store every pending file of a job, chunk by chunk, then mark it as finished
+
+        Args:
+            job_id (int): job id
+            user_id (int): user the professors are linked to
+        """
+        try:
+            with metrics.span("ingest.job"):
+                while not self._stop.is_set():
+                    files = self.db.read_ingest_files(job_id, self.chunk_size)
+                    if files.empty:
+                        break
+                    self._run_chunk(job_id, user_id, files)
+            if self._stop.is_set():
+                return
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e!r}")
+            metrics.increment("ingest_jobs_total", result="failed")
+            self.db.finish_ingest_job(job_id, str(e) or type(e).__name__)
+            return
+        metrics.increment("ingest_jobs_total", result="done")
+        self.db.finish_ingest_job(job_id)
+
+    def _run_chunk(self, job_id: int, user_id: int, files: pd.DataFrame) -> None:
+        """Parse, embed and store a chunk of files of a job, then commit its progress
+
+        Args:
+            job_id (int): job id
+            user_id (int): user the professors are linked to
+            files (pd.DataFrame): file_id, file_name and content of the files
+        """
+        self.db.update_ingest_job(job_id, stage="Processando currículos")
+        resumes = []
+        for file_name, content in files[["file_name", "content"]].itertuples(index=False):
+            resume = io.BytesIO(bytes(content))
+            resume.name = file_name
+            resumes.append(resume)
+        professors_registered = self.db.read_professor(user_id)
+        known_fingerprints = (
+            set() if professors_registered is None else set(professors_registered["content_hash"].dropna())
+        )
+        professors, fingerprints, lattes_ids, errors, skipped = self.facade.parse_resume(resumes, known_fingerprints)
+
+        self.db.update_ingest_job(job_id, stage="Calculando embeddings das especialidades")
+        embedded = self.db.find_embedded(professors, fingerprints, lattes_ids)
+        try:
+            embeddings = self.facade.embed_professors(
+                {nome: areas for nome, areas in professors.items() if nome not in embedded}
+            )
+        except ConnectionRefusedError as e:
+            # Stored without embeddings, they are scored by the model's similarity endpoint instead
+            print(e)
+            embeddings = {}
+
+        self.db.update_ingest_job(job_id, stage="Criando professores no banco de dados")
+        self.db.create_professors(professors, user_id, embeddings, fingerprints, lattes_ids)
+        self.db.update_ingest_job(
+            job_id,
+            file_ids=[int(file_id) for file_id in files["file_id"]],
+            professors=len(professors),
+            skipped=skipped,
+            errors=[f"{file_name}: {error}" for file_name, error in errors],
+        )
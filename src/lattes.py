@@ -0,0 +1,262 @@
+"""Streaming parser for Lattes XML resumes"""
+
+import hashlib
+import io
+import zipfile
+import zlib
+from collections import defaultdict
+from concurrent.futures import Executor
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+from xml.parsers import expat
+
+CHUNK_SIZE = 64 * 1024
+
+
+class LattesParseError(ValueError):
+    """Raised when a file is not a valid Lattes resume"""
+
+
+class BulkParseResult(NamedTuple):
+    """Outcome of parse_resumes_bulk"""
+
+    professors: Dict[str, List[str]]
+    """Specialities by professor's name"""
+    fingerprints: Dict[str, str]
+    """Fingerprint of the resume(s) of every parsed professor"""
+    lattes_ids: Dict[str, str]
+    """Lattes NUMERO-IDENTIFICADOR of the parsed professors whose resume has one"""
+    errors: List[Tuple[str, str]]
+    """File name and error message of every file that couldn't be parsed"""
+    skipped: int
+    """Number of files skipped because their fingerprint was already known"""
+
+
+class _LattesHandler:
+    """Expat handlers that keep only the professor's name and specialities"""
+
+    def __init__(self):
+        self.nome: Optional[str] = None
+        self.areas: List[str] = []
+        self.done = False
+
+    def start_element(self, name: str, attributes: dict) -> None:
+        # The rest of the chunk being fed is still parsed once DADOS-GERAIS is closed
+        if self.done:
+            return
+        if name == "DADOS-GERAIS":
+            self.nome = attributes.get("NOME-COMPLETO", "")
+        elif name == "AREA-DE-ATUACAO":
+            especialidade = attributes.get("NOME-DA-ESPECIALIDADE", "")
+            if especialidade == "":
+                especialidade = attributes.get("NOME-DA-SUB-AREA-DO-CONHECIMENTO", "")
+                if especialidade == "":
+                    especialidade = attributes.get("NOME-DA-AREA-DO-CONHECIMENTO", "")
+            self.areas.append(especialidade)
+
+    def end_element(self, name: str) -> None:
+        if name == "DADOS-GERAIS":
+            self.done = True
+
+
+def parse_lattes(resume: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Tuple[str, List[str]]:
+    """Parse a Lattes resume incrementally, keeping only the name and specialities
+
+    The specialities live inside DADOS-GERAIS, so parsing stops as soon as that
+    element is closed and the (much larger) production sections are never read.
+    The encoding declared by the file (ISO-8859-1 for Lattes exports) is honoured.
+
+    Args:
+        resume (BinaryIO): binary file-like object with the XML
+        chunk_size (int): number of bytes fed to the parser at a time
+
+    Raises:
+        LattesParseError: if the file is not well formed or has no DADOS-GERAIS
+
+    Returns:
+        Tuple[str, List[str]]: professor's name and specialities
+    """
+    handler = _LattesHandler()
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.start_element
+    parser.EndElementHandler = handler.end_element
+    try:
+        while not handler.done:
+            chunk = resume.read(chunk_size)
+            if not chunk:
+                parser.Parse(b"", True)
+                break
+            parser.Parse(chunk, False)
+    except expat.ExpatError as e:
+        raise LattesParseError(f"XML inválido: {e}") from e
+    if handler.nome is None:
+        raise LattesParseError("Currículo sem DADOS-GERAIS")
+    return handler.nome, handler.areas
+
+
+def iter_resume_files(name: str, resume: BinaryIO) -> Iterator[Tuple[str, Union[bytes, LattesParseError]]]:
+    """Yield the XML files of an upload, streaming the members out of zip archives
+
+    A member that can't be extracted (corrupted, encrypted or compressed with an
+    unsupported method) is yielded with its error, the rest of the archive is still read.
+
+    Args:
+        name (str): uploaded file name
+        resume (BinaryIO): uploaded file, either a Lattes XML or a zip of them
+
+    Raises:
+        LattesParseError: if the zip archive itself is corrupted
+
+    Returns:
+        Iterator[Tuple[str, Union[bytes, LattesParseError]]]: file name and content (or error) of every XML
+    """
+    if not name.lower().endswith(".zip"):
+        yield name, resume.read()
+        return
+    try:
+        with zipfile.ZipFile(resume) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or not member.filename.lower().endswith(".xml"):
+                    continue
+                file_name = f"{name}/{member.filename}"
+                try:
+                    with archive.open(member) as content:
+                        data = content.read()
+                except (zlib.error, NotImplementedError, RuntimeError, EOFError, zipfile.BadZipFile) as e:
+                    yield file_name, LattesParseError(f"Arquivo corrompido no zip: {e}")
+                    continue
+                yield file_name, data
+    except zipfile.BadZipFile as e:
+        raise LattesParseError(f"Arquivo zip inválido: {e}") from e
+
+
+def read_root_attributes(content: bytes) -> Dict[str, str]:
+    """Read the attributes of the root element without parsing the rest of the document
+
+    Args:
+        content (bytes): XML content
+
+    Returns:
+        Dict[str, str]: root attributes, empty if the document is malformed
+    """
+    root = {}
+
+    def start_element(name: str, attributes: dict) -> None:
+        root.setdefault("attributes", attributes)
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start_element
+    try:
+        for start in range(0, len(content), 4096):
+            parser.Parse(content[start:start + 4096], False)
+            if root:
+                break
+    except expat.ExpatError:
+        pass
+    return root.get("attributes", {})
+
+
+def fingerprint_resume(content: bytes, attributes: Optional[Dict[str, str]] = None) -> str:
+    """Fingerprint a resume by its bytes and, when present, its Lattes update date
+
+    Args:
+        content (bytes): XML content
+        attributes (Optional[Dict[str, str]]): root attributes, read from the content if None
+
+    Returns:
+        str: "<DATA-ATUALIZACAO>:<sha256>", or just the sha256 when there's no update date
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    if attributes is None:
+        attributes = read_root_attributes(content)
+    data_atualizacao = attributes.get("DATA-ATUALIZACAO")
+    return f"{data_atualizacao}:{digest}" if data_atualizacao else digest
+
+
+def _parse_file(
+    item: Tuple[str, bytes, str, Optional[str]]
+) -> Tuple[str, str, Optional[str], Optional[str], List[str], Optional[str]]:
+    """Parse a single named resume, reporting the error instead of raising it
+
+    Args:
+        item (Tuple[str, bytes, str, Optional[str]]): file name, content, fingerprint and Lattes id
+
+    Returns:
+        Tuple[str, str, Optional[str], Optional[str], List[str], Optional[str]]: file name, fingerprint,
+        Lattes id, professor's name, specialities and error
+    """
+    file_name, content, fingerprint, lattes_id = item
+    try:
+        nome, areas = parse_lattes(io.BytesIO(content))
+    except LattesParseError as e:
+        return file_name, fingerprint, lattes_id, None, [], str(e)
+    return file_name, fingerprint, lattes_id, nome, areas, None
+
+
+def parse_resumes_bulk(
+    resumes: Iterable[Tuple[str, BinaryIO]],
+    executor: Optional[Executor] = None,
+    chunksize: int = 4,
+    known_fingerprints: Optional[Set[str]] = None,
+) -> BulkParseResult:
+    """Parse several resumes (XML files or zip archives), spreading the work across an executor
+
+    Files whose fingerprint is already known are skipped before parsing. Malformed files
+    are reported one by one, the rest of the batch is still parsed.
+
+    Args:
+        resumes (Iterable[Tuple[str, BinaryIO]]): file name and binary file-like object of every upload
+        executor (Optional[Executor]): process pool to parse in, the current thread if None
+        chunksize (int): number of files sent to a worker at a time
+        known_fingerprints (Optional[Set[str]]): fingerprints of the resumes already stored
+
+    Returns:
+        BulkParseResult: parsed professors, their fingerprints and Lattes ids, errors and number of skipped files
+    """
+    known_fingerprints = known_fingerprints or set()
+    errors = []
+    skipped = 0
+
+    def files() -> Iterator[Tuple[str, bytes, str, Optional[str]]]:
+        nonlocal skipped
+        for name, resume in resumes:
+            try:
+                for file_name, content in iter_resume_files(name, resume):
+                    if isinstance(content, LattesParseError):
+                        errors.append((file_name, str(content)))
+                        continue
+                    attributes = read_root_attributes(content)
+                    fingerprint = fingerprint_resume(content, attributes)
+                    if fingerprint in known_fingerprints:
+                        skipped += 1
+                    else:
+                        yield file_name, content, fingerprint, attributes.get("NUMERO-IDENTIFICADOR") or None
+            except LattesParseError as e:
+                errors.append((name, str(e)))
+
+    if executor is None:
+        results = map(_parse_file, files())
+    else:
+        results = executor.map(_parse_file, files(), chunksize=chunksize)
+    professors = defaultdict(list)
+    fingerprints = defaultdict(list)
+    lattes_ids = {}
+    for file_name, fingerprint, lattes_id, nome, areas, error in results:
+        if error is not None:
+            errors.append((file_name, error))
+        else:
+            professors[nome].extend(areas)
+            fingerprints[nome].append(fingerprint)
+            if lattes_id:
+                lattes_ids[nome] = lattes_id
+    return BulkParseResult(
+        professors,
+        {
+            # A professor split across several files gets a combined fingerprint, matched by none of them
+            nome: values[0] if len(values) == 1 else hashlib.sha256("".join(sorted(values)).encode()).hexdigest()
+            for nome, values in fingerprints.items()
+        },
+        lattes_ids,
+        errors,
+        skipped,
+    )
@@ -0,0 +1,325 @@
+"""Lightweight timing spans, counters and histograms for the resumes pipeline
+
+Everything goes through the process wide `metrics` registry, disabled by default.
+While disabled, spans are a shared no-op context manager and counters and
+histograms return right away, so the instrumentation can stay in hot paths.
+"""
+
+import bisect
+import contextvars
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_NULL_SPAN = nullcontext()
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, int, float, float]]]] = contextvars.ContextVar(
+    "trace", default=None
+)
+_depth: contextvars.ContextVar[int] = contextvars.ContextVar("depth", default=0)
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class _Histogram:
+    """Cumulative bucket counts, sum and count of the observed values"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Registry of counters, histograms and gauge collectors"""
+
+    def __init__(self, enabled: bool = False, prefix: str = "tccguia", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """Initialize an empty registry
+
+        Args:
+            enabled (bool): record anything at all
+            prefix (str): prefix of the exported metric names
+            buckets (Tuple[float, ...]): histogram bucket upper bounds, in seconds
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[LabelKey, float] = {}
+        self._histograms: Dict[LabelKey, _Histogram] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> LabelKey:
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """Add to a counter
+
+        Args:
+            name (str): counter name
+            value (float): amount added
+            labels: counter labels
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record a duration in a histogram
+
+        Args:
+            name (str): histogram name
+            seconds (float): observed duration
+            labels: histogram labels
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def span(self, name: str):
+        """Time a block into the span_seconds histogram and the active trace, if any
+
+        Args:
+            name (str): span name, dotted by component (e.g. "database.read_professor")
+
+        Returns:
+            ContextManager: the timing context, a shared no-op one while disabled
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        depth = _depth.get()
+        token = _depth.set(depth + 1)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            _depth.reset(token)
+            self.observe("span_seconds", elapsed, span=name)
+            spans = _trace.get()
+            if spans is not None:
+                spans.append((name, depth, start, elapsed))
+
+    def timed(self, name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """Decorate a function so every call is a span
+
+        Args:
+            name (str): span name
+
+        Returns:
+            Callable: decorator
+        """
+
+        def decorator(func: Callable[..., T]) -> Callable[..., T]:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs) -> T:
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @contextmanager
+    def trace(self) -> Iterator[List[Dict[str, Any]]]:
+        """Collect the spans of the current thread (e.g. one Streamlit rerun)
+
+        Returns:
+            Iterator[List[Dict[str, Any]]]: span, depth, offset and duration (in milliseconds)
+            of every finished span, filled when the block exits
+        """
+        spans = []
+        result = []
+        token = _trace.set(spans)
+        origin = time.perf_counter()
+        try:
+            yield result
+        finally:
+            _trace.reset(token)
+            result.extend(
+                {"span": name, "depth": depth, "start_ms": (start - origin) * 1000, "duration_ms": elapsed * 1000}
+                for name, depth, start, elapsed in sorted(spans, key=lambda span: span[2])
+            )
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        """Export gauges read from a component's stats at export time
+
+        Args:
+            name (str): collector name, part of the exported metric names
+            collect (Callable[[], Dict[str, Any]]): returns numbers, or dicts of numbers
+                labelled by their key (e.g. Database.cache_stats)
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def reset(self) -> None:
+        """Forget every counter and histogram"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _gauges(self) -> Dict[LabelKey, float]:
+        """Read every collector"""
+        with self._lock:
+            collectors = list(self._collectors.items())
+        gauges = {}
+        for collector, collect in collectors:
+            for key, value in collect().items():
+                if isinstance(value, dict):
+                    for name, number in value.items():
+                        gauges[self._key(f"{collector}_{name}", {collector: key})] = float(number)
+                else:
+                    gauges[self._key(f"{collector}_{key}", {})] = float(value)
+        return gauges
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters, histogram summaries and gauges as JSON serializable data"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (histogram.count, histogram.sum, histogram.quantile(0.5), histogram.quantile(0.95),
+                      histogram.quantile(0.99))
+                for key, histogram in self._histograms.items()
+            }
+
+        def entry(key: LabelKey, **values) -> Dict[str, Any]:
+            return {"name": key[0], "labels": dict(key[1]), **values}
+
+        return {
+            "counters": [entry(key, value=value) for key, value in sorted(counters.items())],
+            "histograms": [
+                entry(key, count=count, sum=total, p50=p50, p95=p95, p99=p99)
+                for key, (count, total, p50, p95, p99) in sorted(histograms.items())
+            ],
+            "gauges": [entry(key, value=value) for key, value in sorted(self._gauges().items())],
+        }
+
+    def to_json(self) -> str:
+        """Export as JSON"""
+        return json.dumps(self.snapshot(), default=str)
+
+    def to_prometheus(self) -> str:
+        """Export in the Prometheus text exposition format"""
+
+        def labels_text(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ""
+            escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+            return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(histogram.counts), histogram.sum, histogram.count))
+                for key, histogram in self._histograms.items()
+            )
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{labels_text(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric}_bucket{labels_text(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{labels_text(labels)} {total}")
+            lines.append(f"{metric}_count{labels_text(labels)} {count}")
+        for (name, labels), value in sorted(self._gauges().items()):
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} gauge")
+                typed.add(metric)
+            lines.append(f"{metric}{labels_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread
+
+        The endpoints aren't authenticated, so they only listen on the loopback
+        interface unless another address is explicitly given.
+
+        Args:
+            port (int): listening port
+            host (str): listening address, e.g. "0.0.0.0" to be scraped from other hosts
+
+        Returns:
+            ThreadingHTTPServer: running server
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path == "/metrics":
+                    body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = registry.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+
+metrics = Metrics()
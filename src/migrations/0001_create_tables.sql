@@ -0,0 +1,15 @@
+-- Base tables, as they were created before migrations existed
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    senha TEXT NOT NULL,
+    professores INTEGER[]
+);
+
+CREATE TABLE IF NOT EXISTS docentes (
+    professor_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    nome TEXT NOT NULL,
+    areas_de_atuacao TEXT[] NOT NULL DEFAULT '{}'
+);
@@ -0,0 +1,2 @@
+-- Packed float32 embeddings of every speciality, one row per entry of areas_de_atuacao
+ALTER TABLE docentes ADD COLUMN IF NOT EXISTS embeddings BYTEA;
@@ -0,0 +1,29 @@
+-- users.email is looked up on every login and register
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email);
+
+-- Keep the most recent copy of professors uploaded more than once by the same user,
+-- the older copies are moved to docentes_duplicados instead of being dropped
+CREATE TABLE IF NOT EXISTS docentes_duplicados (
+    professor_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    nome TEXT NOT NULL,
+    areas_de_atuacao TEXT[] NOT NULL,
+    embeddings BYTEA,
+    kept_id INTEGER NOT NULL,
+    removed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+WITH newest AS (
+    SELECT DISTINCT ON (user_id, nome) user_id, nome, professor_id AS kept_id
+    FROM docentes
+    ORDER BY user_id, nome, professor_id DESC
+), removed AS (
+    DELETE FROM docentes AS older USING newest
+    WHERE older.user_id = newest.user_id AND older.nome = newest.nome AND older.professor_id <> newest.kept_id
+    RETURNING older.professor_id, older.user_id, older.nome, older.areas_de_atuacao, older.embeddings, newest.kept_id
+)
+INSERT INTO docentes_duplicados (professor_id, user_id, nome, areas_de_atuacao, embeddings, kept_id)
+SELECT * FROM removed;
+
+-- Upsert key of create_professors, its leading column also serves the lookups by user_id
+CREATE UNIQUE INDEX IF NOT EXISTS docentes_user_id_nome_key ON docentes (user_id, nome);
@@ -0,0 +1,2 @@
+-- Fingerprint of the resume a professor was parsed from, unchanged re-uploads are skipped
+ALTER TABLE docentes ADD COLUMN IF NOT EXISTS content_hash TEXT;
@@ -0,0 +1,45 @@
+-- docentes becomes a catalog shared by every user, docentes_usuarios links users to it
+CREATE TABLE IF NOT EXISTS docentes_usuarios (
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    professor_id INTEGER NOT NULL REFERENCES docentes (professor_id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, professor_id)
+);
+CREATE INDEX IF NOT EXISTS docentes_usuarios_professor_id_idx ON docentes_usuarios (professor_id);
+
+INSERT INTO docentes_usuarios (user_id, professor_id)
+SELECT user_id, professor_id FROM docentes
+ON CONFLICT DO NOTHING;
+
+-- Catalog key: the Lattes id when known, else the name and resume fingerprint, else the name and specialities
+-- (see Database.catalog_key)
+ALTER TABLE docentes ADD COLUMN IF NOT EXISTS lattes_id TEXT;
+ALTER TABLE docentes ADD COLUMN IF NOT EXISTS catalog_key TEXT;
+UPDATE docentes SET catalog_key = COALESCE(
+    'hash:' || nome || E'\x1f' || content_hash,
+    'areas:' || nome || E'\x1f' || md5(array_to_string(areas_de_atuacao, E'\x1f'))
+);
+
+-- Merge the copies uploaded by different users, keeping one with embeddings when there's any
+CREATE TEMPORARY TABLE docentes_mantidos ON COMMIT DROP AS
+SELECT professor_id, first_value(professor_id) OVER (
+    PARTITION BY catalog_key ORDER BY embeddings IS NULL, professor_id
+) AS kept_id
+FROM docentes;
+
+INSERT INTO docentes_usuarios (user_id, professor_id)
+SELECT links.user_id, kept.kept_id
+FROM docentes_usuarios AS links JOIN docentes_mantidos AS kept USING (professor_id)
+WHERE kept.professor_id <> kept.kept_id
+ON CONFLICT DO NOTHING;
+
+DELETE FROM docentes USING docentes_mantidos AS kept
+WHERE docentes.professor_id = kept.professor_id AND kept.professor_id <> kept.kept_id;
+
+ALTER TABLE docentes ALTER COLUMN catalog_key SET NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS docentes_catalog_key_key ON docentes (catalog_key);
+DROP INDEX IF EXISTS docentes_user_id_nome_key;
+ALTER TABLE docentes DROP COLUMN IF EXISTS user_id;
+
+UPDATE users SET professores = ARRAY(
+    SELECT professor_id FROM docentes_usuarios WHERE docentes_usuarios.user_id = users.id ORDER BY professor_id
+);
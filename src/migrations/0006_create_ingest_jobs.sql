@@ -0,0 +1,31 @@
+-- Resumes uploads processed in the background (see src.jobs.IngestQueue), kept across reruns and restarts
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    job_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    stage TEXT,
+    tema TEXT,
+    files_total INTEGER NOT NULL DEFAULT 0,
+    files_done INTEGER NOT NULL DEFAULT 0,
+    professors INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    errors TEXT[] NOT NULL DEFAULT '{}',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS ingest_jobs_user_id_idx ON ingest_jobs (user_id, job_id);
+CREATE INDEX IF NOT EXISTS ingest_jobs_pending_idx ON ingest_jobs (job_id) WHERE status IN ('queued', 'running');
+
+-- Uploaded files, whose content is dropped once they are stored, so a restarted job resumes where it stopped
+CREATE TABLE IF NOT EXISTS ingest_job_files (
+    file_id SERIAL PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES ingest_jobs (job_id) ON DELETE CASCADE,
+    file_name TEXT NOT NULL,
+    content BYTEA,
+    done BOOLEAN NOT NULL DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS ingest_job_files_pending_idx ON ingest_job_files (job_id, file_id) WHERE NOT done;
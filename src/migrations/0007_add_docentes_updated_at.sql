@@ -0,0 +1,3 @@
+-- Last change of every catalog row, the embeddings index re-reads the rows changed since it was saved
+ALTER TABLE docentes ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS docentes_updated_at_idx ON docentes (updated_at);
@@ -0,0 +1,67 @@
+"""Versioned schema migrations
+
+Every NNNN_name.sql file in this package is a migration, applied in version
+order. Applied versions are recorded in the schema_migrations table.
+"""
+
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import text
+
+MIGRATIONS_DIR = Path(__file__).parent
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# pg_advisory_xact_lock key, serializes processes starting at the same time
+LOCK_KEY = 7_382_901
+
+
+def list_migrations() -> List[Tuple[int, str, Path]]:
+    """List the available migrations
+
+    Returns:
+        List[Tuple[int, str, Path]]: version, name and path of every migration, ordered by version
+    """
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = MIGRATION_FILE.match(path.name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), path))
+    return sorted(migrations)
+
+
+def apply_migrations(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """Apply the pending migrations in a single transaction
+
+    Args:
+        engine (Engine): database engine
+        target (Optional[int]): last version to apply, every version if None
+
+    Returns:
+        List[int]: versions applied by this call
+    """
+    applied_now = []
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+        connection.execute(
+            text(
+                """CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )"""
+            )
+        )
+        applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+        for version, name, path in list_migrations():
+            if version in applied or (target is not None and version > target):
+                continue
+            connection.exec_driver_sql(path.read_text(encoding="utf-8"))
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name},
+            )
+            applied_now.append(version)
+            print(f"Migration {version:04d}_{name} applied")
+    return applied_now
@@ -0,0 +1,215 @@
+"""HTTP client for the model inference endpoints"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.metrics import metrics
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class ModelUnavailableError(ConnectionRefusedError):
+    """Raised when the model could not answer before the retries or the deadline ran out"""
+
+
+class ModelClient:
+    """Pooled, concurrent and retrying client shared by every session"""
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        pool_size: int = 10,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        timeout: float = 30.0,
+        deadline: float = 60.0,
+    ):
+        """Initialize the connection pool and the worker threads
+
+        Args:
+            headers (Optional[Dict[str, str]]): headers sent in every request
+            pool_size (int): number of keep-alive connections kept per host
+            max_concurrency (int): maximum number of requests in flight, over every call and thread
+            max_retries (int): maximum number of retries per request
+            base_delay (float): first backoff delay in seconds
+            max_delay (float): backoff delay cap in seconds
+            timeout (float): socket timeout of a single attempt in seconds
+            deadline (float): total time budget of a request, retries included, in seconds
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.deadline = deadline
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="model-client")
+        # The executor only bounds post_many, the single payload calls run on their caller's thread
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def post(self, url: str, payload: Dict[str, Any], deadline: Optional[float] = None) -> Any:
+        """Post a payload to the model, retrying with exponential backoff and jitter
+
+        Every request, from any thread, waits for one of the max_concurrency slots, the
+        wait counts against the deadline.
+
+        Args:
+            url (str): endpoint url
+            payload (Dict[str, Any]): JSON payload
+            deadline (Optional[float]): time budget in seconds, the client's default if None
+
+        Raises:
+            ModelUnavailableError: if the model didn't answer within the retries or the deadline,
+                or answered with something that isn't JSON
+
+        Returns:
+            Any: decoded JSON response
+        """
+        return self._post_until(url, payload, self._expires_at(deadline))
+
+    def post_many(self, url: str, payloads: List[Dict[str, Any]], deadline: Optional[float] = None) -> List[Any]:
+        """Post several payloads concurrently, bounded by the client's concurrency
+
+        The deadline covers the whole call, time spent waiting for a free worker or slot included.
+        The first failure cancels the requests that haven't finished.
+
+        Args:
+            url (str): endpoint url
+            payloads (List[Dict[str, Any]]): JSON payloads
+            deadline (Optional[float]): time budget of the whole call in seconds, the client's default if None
+
+        Raises:
+            ModelUnavailableError: if any request failed or the deadline ran out
+
+        Returns:
+            List[Any]: decoded JSON responses, in the same order as the payloads
+        """
+        expires_at = self._expires_at(deadline)
+        if len(payloads) == 1:
+            return [self._post_until(url, payloads[0], expires_at)]
+        cancelled = threading.Event()
+        futures = [
+            self._executor.submit(self._post_until, url, payload, expires_at, cancelled) for payload in payloads
+        ]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        failed = next((future for future in futures if future in done and future.exception() is not None), None)
+        if failed is not None:
+            cancelled.set()
+            for future in pending:
+                future.cancel()
+            raise failed.exception()
+        return [future.result() for future in futures]
+
+    def _expires_at(self, deadline: Optional[float]) -> float:
+        """Monotonic time a request (or a batch of them) started now has to finish by"""
+        return time.monotonic() + (deadline if deadline is not None else self.deadline)
+
+    def _post_until(
+        self, url: str, payload: Dict[str, Any], expires_at: float, cancelled: Optional[threading.Event] = None
+    ) -> Any:
+        """Post a payload, retrying until it succeeds, expires_at is reached or the batch is cancelled
+
+        Args:
+            url (str): endpoint url
+            payload (Dict[str, Any]): JSON payload
+            expires_at (float): time.monotonic() value the request has to finish by
+            cancelled (Optional[threading.Event]): set when another request of the batch failed
+
+        Raises:
+            ModelUnavailableError: if the model didn't answer within the retries or the deadline,
+                or answered with something that isn't JSON
+
+        Returns:
+            Any: decoded JSON response
+        """
+        last_error = "sem resposta"
+        for attempt in range(self.max_retries + 1):
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0 or (cancelled is not None and cancelled.is_set()):
+                break
+            retry_after = None
+            if not self._slots.acquire(timeout=remaining):
+                last_error = "limite de requisições simultâneas"
+                break
+            started = time.perf_counter()
+            try:
+                timeout = min(self.timeout, max(expires_at - time.monotonic(), 0.001))
+                try:
+                    response = self.session.post(url, json=payload, timeout=timeout)
+                finally:
+                    self._slots.release()
+            except (requests.Timeout, requests.ConnectionError) as e:
+                last_error = str(e)
+                metrics.observe("model_request_seconds", time.perf_counter() - started, url=url, status="error")
+            else:
+                metrics.observe("model_request_seconds", time.perf_counter() - started, url=url, status=response.status_code)
+                if response.ok:
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        metrics.increment("model_failures_total", url=url)
+                        raise ModelUnavailableError(f"Resposta inválida do modelo: {response.text[:200]}") from e
+                if response.status_code not in RETRYABLE_STATUS:
+                    raise ModelUnavailableError(f"Modelo retornou código {response.status_code}: {response.text}")
+                last_error = f"código {response.status_code}"
+                retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+            if attempt == self.max_retries:
+                break
+            delay = retry_after if retry_after is not None else self._backoff(attempt)
+            if time.monotonic() + delay >= expires_at:
+                break
+            print(f"Modelo indisponível ({last_error}), tentando novamente em {delay:.1f} segundos")
+            metrics.increment("model_retries_total", url=url)
+            if cancelled is not None:
+                if cancelled.wait(delay):
+                    break
+            else:
+                time.sleep(delay)
+
+        metrics.increment("model_failures_total", url=url)
+        raise ModelUnavailableError(
+            f"Número de tentativas de conexão máxima excedida, modelo está indisponível ({last_error})."
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff delay with full jitter
+
+        Args:
+            attempt (int): zero based attempt number
+
+        Returns:
+            float: delay in seconds
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _parse_retry_after(self, value: Optional[str]) -> Optional[float]:
+        """Parse a Retry-After header, given in seconds or as an HTTP date
+
+        Args:
+            value (Optional[str]): header value
+
+        Returns:
+            Optional[float]: delay in seconds capped at max_delay, None if absent or invalid
+        """
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0.0), self.max_delay)
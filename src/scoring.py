@@ -0,0 +1,558 @@
+"""Scoring backends that rank professors against a TCC theme"""
+
+import contextvars
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.ann import IVFIndex
+from src.cache import LRUCache, SimilarityCache
+from src.embeddings import (
+    grouped_max_score_matrix, grouped_max_scores, normalize_rows, pack_embeddings, unpack_embeddings,
+)
+from src.metrics import metrics
+from src.text import normalize_text, tokenize
+
+if TYPE_CHECKING:
+    # requests (and scipy, see _LexicalIndex) are imported on first use, pages that don't score start faster
+    from src.model_client import ModelClient
+
+API_URL = "https://api-inference.huggingface.co/models/BAAI/bge-m3"
+EMBEDDING_URL = "https://api-inference.huggingface.co/pipeline/feature-extraction/BAAI/bge-m3"
+
+# time.monotonic() value the model requests of the current scoring call have to finish by
+_expires_at: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("expires_at", default=None)
+
+
+def best_scores(scores: Dict[str, float], top_k: Optional[int]) -> Dict[str, float]:
+    """Keep the top_k highest scores
+
+    Args:
+        scores (Dict[str, float]): score by professor's name
+        top_k (Optional[int]): number of professors kept, all of them if None
+
+    Returns:
+        Dict[str, float]: scores of the kept professors, from the highest
+    """
+    if top_k is None:
+        return scores
+    return dict(sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k])
+
+
+class ScoringBackend(ABC):
+    """Interface of the professors scoring backends"""
+
+    name = "backend"
+
+    def prepare(self, professors: Dict[str, List[str]]) -> Dict[str, bytes]:
+        """Compute, at ingest time, what the backend stores next to every professor
+
+        Args:
+            professors (Dict[str, List[str]]): professors's names and specialities
+
+        Returns:
+            Dict[str, bytes]: packed embeddings by professor's name, empty if the backend stores nothing
+        """
+        return {}
+
+    @abstractmethod
+    def score(self, professors: pd.DataFrame, tcc_theme: str, top_k: Optional[int] = None) -> Dict[str, float]:
+        """Score every professor against the theme
+
+        Args:
+            professors (pd.DataFrame): professors with nome, areas_de_atuacao and embeddings columns
+            tcc_theme (str): TCC theme
+            top_k (Optional[int]): only the top_k most similar professors are returned (and backends with
+                an embeddings index may search it instead of scoring every professor), all of them if None
+
+        Raises:
+            ConnectionRefusedError: if a remote backend is unavailable
+
+        Returns:
+            Dict[str, float]: highest speciality similarity, between 0 and 1, by professor's name
+        """
+
+    def score_many(self, professors: pd.DataFrame, themes: List[str]) -> np.ndarray:
+        """Score every professor against several themes
+
+        Args:
+            professors (pd.DataFrame): professors with nome, areas_de_atuacao and embeddings columns
+            themes (List[str]): TCC themes
+
+        Raises:
+            ConnectionRefusedError: if a remote backend is unavailable
+
+        Returns:
+            np.ndarray: (themes, professors) scores in the professors's row order, NaN when unscored
+        """
+        names = list(professors["nome"])
+        matrix = np.full((len(themes), len(names)), np.nan, dtype=np.float32)
+        for row, theme in enumerate(themes):
+            scores = self.score(professors, theme)
+            matrix[row] = [scores.get(nome, np.nan) for nome in names]
+        return matrix
+
+    def score_with_fallback(
+        self, professors: pd.DataFrame, tcc_theme: str, top_k: Optional[int] = None
+    ) -> Tuple[Dict[str, float], bool]:
+        """Score every professor against the theme, telling whether a fallback backend did it
+
+        Args:
+            professors (pd.DataFrame): professors with nome, areas_de_atuacao and embeddings columns
+            tcc_theme (str): TCC theme
+            top_k (Optional[int]): only the top_k most similar professors are returned, all of them if None
+
+        Returns:
+            Tuple[Dict[str, float], bool]: scores as returned by score, and whether a fallback produced them
+        """
+        return self.score(professors, tcc_theme, top_k), False
+
+    def score_many_with_fallback(self, professors: pd.DataFrame, themes: List[str]) -> Tuple[np.ndarray, bool]:
+        """Score every professor against several themes, telling whether a fallback backend did it
+
+        Args:
+            professors (pd.DataFrame): professors with nome, areas_de_atuacao and embeddings columns
+            themes (List[str]): TCC themes
+
+        Returns:
+            Tuple[np.ndarray, bool]: scores as returned by score_many, and whether a fallback produced them
+        """
+        return self.score_many(professors, themes), False
+
+
+class RemoteBackend(ScoringBackend):
+    """Scores with the BGE-M3 inference endpoints"""
+
+    name = "remote"
+
+    def __init__(
+        self,
+        client: "ModelClient",
+        api_url: str,
+        embedding_url: Optional[str] = None,
+        max_batch_size: int = 64,
+        cache: Optional[SimilarityCache] = None,
+        deadline: Optional[float] = None,
+        index: Optional[IVFIndex] = None,
+        index_threshold: int = 5000,
+    ):
+        """Initialize the backend
+
+        Args:
+            client (ModelClient): shared model client
+            api_url (str): sentence similarity endpoint
+            embedding_url (Optional[str]): feature extraction endpoint, embeddings aren't used if None
+            max_batch_size (int): maximum number of sentences per request
+            cache (Optional[SimilarityCache]): cache of model results
+            deadline (Optional[float]): time budget of a whole score, score_many or search call in seconds
+                (every model request it makes included), the client's default per request if None
+            index (Optional[IVFIndex]): embeddings index used for large catalogs
+            index_threshold (int): number of professors from which a top_k score searches the index
+        """
+        self.client = client
+        self.api_url = api_url
+        self.embedding_url = embedding_url
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self.deadline = deadline
+        self.index = index
+        self.index_threshold = index_threshold
+
+    def prepare(self, professors: Dict[str, List[str]]) -> Dict[str, bytes]:
+        """Compute the specialities embeddings of every professor
+
+        Args:
+            professors (Dict[str, List[str]]): professors's names and specialities
+
+        Returns:
+            Dict[str, bytes]: packed float32 embeddings (one row per speciality) by professor's name
+        """
+        if not professors or self.embedding_url is None:
+            return {}
+        areas = list(dict.fromkeys(area for specialities in professors.values() for area in specialities))
+        vectors = self._embed_texts(areas)
+        return {
+            nome: pack_embeddings(np.stack([vectors[area] for area in specialities]))
+            for nome, specialities in professors.items()
+            if specialities
+        }
+
+    def score(self, professors: pd.DataFrame, tcc_theme: str, top_k: Optional[int] = None) -> Dict[str, float]:
+        """Score every professor against the theme
+
+        Professors with stored embeddings are scored in a single matrix-vector product against
+        the theme embedding. The remaining ones have every distinct speciality scored once,
+        in batches, by the sentence similarity endpoint. When only the top_k best are asked for,
+        catalogs with at least index_threshold professors are searched in the embeddings index,
+        and the professors stored without embeddings (never indexed) are scored by the endpoint.
+
+        Args:
+            professors (pd.DataFrame): professors with nome, areas_de_atuacao and embeddings columns
+            tcc_theme (str): TCC theme
+            top_k (Optional[int]): only the top_k most similar professors are returned, all of them if None
+
+        Returns:
+            Dict[str, float]: highest speciality similarity by professor's name
+        """
+        with self._budget():
+            if (
+                top_k is not None and self.index is not None and self.embedding_url is not None
+                and len(professors) >= self.index_threshold
+            ):
+                scores = self.search(professors, tcc_theme, top_k)
+                unembedded = professors[professors["embeddings"].isna()]
+                if not unembedded.empty:
+                    scores.update(self._score(unembedded, tcc_theme))
+                return best_scores(scores, top_k)
+            return best_scores(self._score(professors, tcc_theme), top_k)
+
+    def _score(self, professors: pd.DataFrame, tcc_theme: str) -> Dict[str, float]:
+        scores = {}
+        records = professors.to_dict(orient="records")
+        embedded = []
+        if self.embedding_url is not None:
+            for item in records:
+                matrix = unpack_embeddings(item.get("embeddings"), len(item["areas_de_atuacao"]))
+                if matrix is not None:
+                    embedded.append((item["nome"], matrix))
+        if embedded:
+            theme = self._embed_texts([tcc_theme])[tcc_theme]
+            matrices = [matrix for _, matrix in embedded]
+            for (nome, _), score in zip(embedded, grouped_max_scores(theme, matrices)):
+                scores[nome] = score
+        records = [item for item in records if item["nome"] not in scores]
+        areas = list(dict.fromkeys(area for item in records for area in item["areas_de_atuacao"]))
+        areas_scores = self._score_areas(tcc_theme, areas) if areas else {}
+        for item in records:
+            scores_list = [areas_scores[area] for area in item["areas_de_atuacao"] if area in areas_scores]
+            if scores_list:
+                scores[item["nome"]] = max(scores_list)
+        return scores
+
+    def score_many(self, professors: pd.DataFrame, themes: List[str]) -> np.ndarray:
+        """Score every professor against several themes
+
+        The themes are embedded in batches and scored against the stored embeddings in a
+        single matrix product. Professors stored without embeddings are scored theme by theme.
+
+        Args:
+            professors (pd.DataFrame): professors with nome, areas_de_atuacao and embeddings columns
+            themes (List[str]): TCC themes
+
+        Returns:
+            np.ndarray: (themes, professors) scores in the professors's row order, NaN when unscored
+        """
+        with self._budget():
+            return self._score_many(professors, themes)
+
+    def _score_many(self, professors: pd.DataFrame, themes: List[str]) -> np.ndarray:
+        if self.embedding_url is None:
+            return super().score_many(professors, themes)
+        columns, matrices = [], []
+        for column, (areas, embeddings) in enumerate(zip(professors["areas_de_atuacao"], professors["embeddings"])):
+            matrix = unpack_embeddings(embeddings, len(areas))
+            if matrix is not None:
+                columns.append(column)
+                matrices.append(matrix)
+        scores = np.full((len(themes), len(professors)), np.nan, dtype=np.float32)
+        if matrices:
+            vectors = self._embed_texts(list(dict.fromkeys(themes)))
+            scores[:, columns] = grouped_max_score_matrix(np.stack([vectors[theme] for theme in themes]), matrices)
+        if len(columns) < len(professors):
+            remaining = np.setdiff1d(np.arange(len(professors)), columns)
+            scores[:, remaining] = super().score_many(professors.iloc[remaining], themes)
+        return scores
+
+    def search(self, professors: pd.DataFrame, tcc_theme: str, k: int, offset: int = 0) -> Dict[str, float]:
+        """Get a page of the professors most similar to the theme from the embeddings index
+
+        Args:
+            professors (pd.DataFrame): professors with professor_id and nome columns
+            tcc_theme (str): TCC theme
+            k (int): page size
+            offset (int): number of professors skipped
+
+        Returns:
+            Dict[str, float]: best speciality similarity by professor's name, from the most similar
+        """
+        names = dict(zip(professors["professor_id"].astype(int), professors["nome"]))
+        with self._budget():
+            theme = self._embed_texts([tcc_theme])[tcc_theme]
+        return {names[professor_id]: score for professor_id, score in self.index.search(theme, k, offset, names)}
+
+    @contextmanager
+    def _budget(self) -> Iterator[None]:
+        """Share the deadline among every model request of a scoring call, nested calls included"""
+        if self.deadline is None or _expires_at.get() is not None:
+            yield
+            return
+        token = _expires_at.set(time.monotonic() + self.deadline)
+        try:
+            yield
+        finally:
+            _expires_at.reset(token)
+
+    def _embed_texts(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Embed texts in size-bounded batches, reusing cached embeddings
+
+        Args:
+            texts (List[str]): distinct texts
+
+        Returns:
+            Dict[str, np.ndarray]: unit length float32 embedding for every text
+        """
+        keys = {text: SimilarityCache.make_key(self.embedding_url, normalize_text(text)) for text in texts}
+        cached = self.cache.get_many(keys.values()) if self.cache is not None else {}
+        vectors = {text: cached[key] for text, key in keys.items() if key in cached}
+        missing = [text for text in texts if text not in vectors]
+        metrics.increment("cache_requests_total", len(vectors), cache="embeddings", result="hit")
+        metrics.increment("cache_requests_total", len(missing), cache="embeddings", result="miss")
+        batches = [missing[start:start + self.max_batch_size] for start in range(0, len(missing), self.max_batch_size)]
+        responses = self._query([{"inputs": batch} for batch in batches], self.embedding_url)
+        for batch, response in zip(batches, responses):
+            batch_vectors = dict(zip(batch, normalize_rows(response)))
+            vectors.update(batch_vectors)
+            if self.cache is not None:
+                self.cache.set_many({keys[text]: vector for text, vector in batch_vectors.items()})
+        return vectors
+
+    def _score_areas(self, tcc_theme: str, areas: List[str]) -> Dict[str, float]:
+        """Score the distinct specialities against the TCC theme in size-bounded batches
+
+        Scores already in the cache are reused, only the remaining specialities reach the model.
+
+        Args:
+            tcc_theme (str): TCC theme
+            areas (List[str]): distinct specialities
+
+        Returns:
+            Dict[str, float]: similarity score for every speciality
+        """
+        theme_key = normalize_text(tcc_theme)
+        keys = {area: SimilarityCache.make_key(self.api_url, theme_key, normalize_text(area)) for area in areas}
+        cached = self.cache.get_many(keys.values()) if self.cache is not None else {}
+        areas_scores = {area: cached[key] for area, key in keys.items() if key in cached}
+        missing = [area for area in areas if area not in areas_scores]
+        metrics.increment("cache_requests_total", len(areas_scores), cache="similarity", result="hit")
+        metrics.increment("cache_requests_total", len(missing), cache="similarity", result="miss")
+        batches = [missing[start:start + self.max_batch_size] for start in range(0, len(missing), self.max_batch_size)]
+        responses = self._query([
+            {
+                "inputs": {
+                    "source_sentence": f"{tcc_theme}",
+                    "sentences": batch,
+                }
+            }
+            for batch in batches
+        ], self.api_url)
+        for batch, scores_list in zip(batches, responses):
+            batch_scores = dict(zip(batch, scores_list))
+            areas_scores.update(batch_scores)
+            if self.cache is not None:
+                self.cache.set_many({keys[area]: score for area, score in batch_scores.items()})
+        return areas_scores
+
+    def _query(self, payloads: List[Dict[str, str]], url: str) -> List[Dict[str, str]]:
+        """Performs concurrent queries to BGE-M3 endpoint
+
+        Args:
+            payloads (List[Dict[str, str]]): payloads to send
+            url (str): endpoint to query
+
+        Raises:
+            ModelUnavailableError: if the model is unavailable
+
+        Returns:
+            List[Dict[str, str]]: responses, in the same order as the payloads
+        """
+        if not payloads:
+            return []
+        expires_at = _expires_at.get()
+        deadline = None if expires_at is None else max(expires_at - time.monotonic(), 0.0)
+        with metrics.span("model.query"):
+            return self.client.post_many(url, payloads, deadline)
+
+
+class _LexicalIndex:
+    """TF-IDF matrix of the specialities of a professor catalog"""
+
+    def __init__(self, professors: pd.DataFrame):
+        from scipy import sparse
+
+        names, documents, sizes = [], [], []
+        for nome, areas in zip(professors["nome"], professors["areas_de_atuacao"]):
+            if len(areas):
+                names.append(nome)
+                documents.extend(Counter(tokenize(area)) for area in areas)
+                sizes.append(len(areas))
+        self.names = names
+        self.offsets = np.cumsum([0] + sizes[:-1]) if sizes else np.zeros(0, dtype=int)
+        self.vocabulary: Dict[str, int] = {}
+        rows, columns, values = [], [], []
+        for row, counts in enumerate(documents):
+            for token, count in counts.items():
+                rows.append(row)
+                columns.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+                values.append(1.0 + np.log(count))
+        document_frequency = np.bincount(columns, minlength=len(self.vocabulary))
+        self.idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1.0
+        matrix = sparse.csr_matrix(
+            (values, (rows, columns)), shape=(len(documents), len(self.vocabulary)), dtype=np.float32
+        )
+        matrix = matrix.multiply(self.idf.astype(np.float32)).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self.matrix = sparse.diags(1.0 / norms).dot(matrix).tocsr()
+
+    def query(self, text: str) -> Dict[str, float]:
+        """Score a text against every professor
+
+        Args:
+            text (str): query text
+
+        Returns:
+            Dict[str, float]: highest cosine similarity by professor's name
+        """
+        if not self.names:
+            return {}
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for token, count in Counter(tokenize(text)).items():
+            column = self.vocabulary.get(token)
+            if column is not None:
+                vector[column] = (1.0 + np.log(count)) * self.idf[column]
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        scores = self.matrix.dot(vector)
+        return dict(zip(self.names, np.maximum.reduceat(scores, self.offsets).tolist()))
+
+    def query_many(self, texts: List[str]) -> np.ndarray:
+        """Score several texts against every professor in a single sparse matrix product
+
+        Args:
+            texts (List[str]): query texts
+
+        Returns:
+            np.ndarray: (texts, names) matrix with the highest cosine similarity of every pair
+        """
+        from scipy import sparse
+
+        if not self.names:
+            return np.zeros((len(texts), 0), dtype=np.float32)
+        rows, columns, values = [], [], []
+        for row, text in enumerate(texts):
+            for token, count in Counter(tokenize(text)).items():
+                column = self.vocabulary.get(token)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    values.append((1.0 + np.log(count)) * self.idf[column])
+        queries = sparse.csr_matrix(
+            (values, (rows, columns)), shape=(len(texts), len(self.vocabulary)), dtype=np.float32
+        )
+        norms = np.sqrt(np.asarray(queries.multiply(queries).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        queries = sparse.diags(1.0 / norms).dot(queries)
+        scores = np.asarray(self.matrix.dot(queries.T).todense()).T
+        return np.maximum.reduceat(scores, self.offsets, axis=1)
+
+
+class LexicalBackend(ScoringBackend):
+    """Offline TF-IDF scorer over accent-folded, stopword-free specialities
+
+    The index is built once per professor catalog and kept in an LRU cache,
+    so answering a theme is a single sparse matrix-vector product.
+    """
+
+    name = "lexical"
+
+    def __init__(self, max_indexes: int = 64):
+        """Initialize the indexes cache
+
+        Args:
+            max_indexes (int): maximum number of professor catalogs indexed at the same time
+        """
+        self._indexes = LRUCache(max_entries=max_indexes)
+
+    def score(self, professors: pd.DataFrame, tcc_theme: str, top_k: Optional[int] = None) -> Dict[str, float]:
+        return best_scores(self._index(professors).query(tcc_theme), top_k)
+
+    def score_many(self, professors: pd.DataFrame, themes: List[str]) -> np.ndarray:
+        index = self._index(professors)
+        positions = {nome: column for column, nome in enumerate(index.names)}
+        scores = index.query_many(themes)
+        matrix = np.full((len(themes), len(professors)), np.nan, dtype=np.float32)
+        for column, nome in enumerate(professors["nome"]):
+            if nome in positions:
+                matrix[:, column] = scores[:, positions[nome]]
+        return matrix
+
+    def _index(self, professors: pd.DataFrame) -> _LexicalIndex:
+        """Get the catalog's index, building it on the first use
+
+        Args:
+            professors (pd.DataFrame): professors with nome and areas_de_atuacao columns
+
+        Returns:
+            _LexicalIndex: catalog index
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for nome, areas in zip(professors["nome"], professors["areas_de_atuacao"]):
+            digest.update("\x1e".join([nome, *areas]).encode())
+            digest.update(b"\x1d")
+        key = digest.hexdigest()
+        index = self._indexes.get(key)
+        if index is None:
+            index = _LexicalIndex(professors)
+            self._indexes.set(key, index)
+        return index
+
+
+class FallbackBackend(ScoringBackend):
+    """Uses the primary backend, switching to the fallback when it's unavailable or misses its deadline"""
+
+    def __init__(self, primary: ScoringBackend, fallback: ScoringBackend):
+        """Initialize the backend
+
+        Args:
+            primary (ScoringBackend): preferred backend
+            fallback (ScoringBackend): backend used when the primary one fails
+        """
+        self.primary = primary
+        self.fallback = fallback
+        self.name = primary.name
+
+    def prepare(self, professors: Dict[str, List[str]]) -> Dict[str, bytes]:
+        try:
+            return self.primary.prepare(professors)
+        except ConnectionRefusedError as e:
+            print(e)
+            return self.fallback.prepare(professors)
+
+    def score(self, professors: pd.DataFrame, tcc_theme: str, top_k: Optional[int] = None) -> Dict[str, float]:
+        return self.score_with_fallback(professors, tcc_theme, top_k)[0]
+
+    def score_many(self, professors: pd.DataFrame, themes: List[str]) -> np.ndarray:
+        return self.score_many_with_fallback(professors, themes)[0]
+
+    def score_with_fallback(
+        self, professors: pd.DataFrame, tcc_theme: str, top_k: Optional[int] = None
+    ) -> Tuple[Dict[str, float], bool]:
+        try:
+            return self.primary.score(professors, tcc_theme, top_k), False
+        except ConnectionRefusedError as e:
+            print(e)
+            return self.fallback.score(professors, tcc_theme, top_k), True
+
+    def score_many_with_fallback(self, professors: pd.DataFrame, themes: List[str]) -> Tuple[np.ndarray, bool]:
+        try:
+            return self.primary.score_many(professors, themes), False
+        except ConnectionRefusedError as e:
+            print(e)
+            return self.fallback.score_many(professors, themes), True
@@ -0,0 +1,51 @@
+"""Text normalization helpers"""
+
+import re
+import unicodedata
+from typing import List
+
+_WHITESPACE = re.compile(r"\s+")
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+STOPWORDS = frozenset(
+    """a ao aos as com como da das de do dos e em entre na nas no nos o os ou para pela pelas pelo pelos
+    por que se sem sob sobre um uma umas uns the of and in on for to""".split()
+)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a text to be used as a cache key
+
+    Args:
+        text (str): text to normalize
+
+    Returns:
+        str: casefolded text with collapsed whitespace
+    """
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def fold_text(text: str) -> str:
+    """Fold a Portuguese text: lowercase, without accents and punctuation
+
+    Args:
+        text (str): text to fold
+
+    Returns:
+        str: words separated by single spaces
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", without_accents).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a folded text into words, dropping stopwords
+
+    Args:
+        text (str): text to tokenize
+
+    Returns:
+        List[str]: tokens
+    """
+    return [token for token in fold_text(text).split() if token not in STOPWORDS]
@@ -0,0 +1,55 @@
+"""Shared fixtures
+
+Tests using the engine fixture need a scratch PostgreSQL database, whose schema
+is dropped and recreated, given by the TCCGUIA_TEST_DSN environment variable.
+They are skipped when it isn't set.
+"""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from benchmarks.stub_model import StubModelServer
+from src.ann import IVFIndex
+from src.database import Database
+from src.migrations import apply_migrations
+
+
+@pytest.fixture
+def stub():
+    """Start a stub of the model endpoints, configured by calling the fixture"""
+    servers = []
+
+    def start(**options) -> StubModelServer:
+        server = StubModelServer(**options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def engine() -> Engine:
+    """Engine on an empty scratch database, without any migration applied"""
+    dsn = os.environ.get("TCCGUIA_TEST_DSN")
+    if not dsn:
+        pytest.skip("TCCGUIA_TEST_DSN is not set")
+    engine = create_engine(dsn)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine) -> Database:
+    """Migrated database, with an embeddings index and the users 1 (ana) and 2 (bia)"""
+    apply_migrations(engine)
+    db = Database(engine, index=IVFIndex())
+    for name in ["ana", "bia"]:
+        db.create_user(name, f"{name}@x", "")
+    return db
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+from src.ann import IVFIndex
+
+
+def unit_vectors(count: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_saves_are_batched(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = IVFIndex(path=path, save_every=4)
+
+    for professor_id in range(3):
+        index.add(professor_id, unit_vectors(2, seed=professor_id))
+    assert not os.path.exists(path)
+
+    index.add(3, unit_vectors(2, seed=3))
+    assert len(IVFIndex.load(path)) == 8
+
+
+def test_flush_saves_the_pending_mutations(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = IVFIndex(path=path)
+    index.add(1, unit_vectors(2))
+    index.remove(1)
+    index.add(2, unit_vectors(3))
+    assert not os.path.exists(path)
+
+    index.flush()
+    loaded = IVFIndex.load(path)
+    assert loaded.search(unit_vectors(1)[0], k=5) == index.search(unit_vectors(1)[0], k=5)
+    assert len(loaded) == 3
+
+    modified = os.stat(path).st_mtime_ns
+    index.flush()
+    assert os.stat(path).st_mtime_ns == modified
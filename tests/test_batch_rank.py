@@ -0,0 +1,50 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from src.batch_rank import main
+from tests.test_jobs import resume
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    resumes = tmp_path / "curriculos"
+    resumes.mkdir()
+    (resumes / "ana.xml").write_bytes(resume("Ana", "Redes de computadores"))
+    (resumes / "bia.xml").write_bytes(resume("Bia", "Aprendizado de máquina", "Visão computacional"))
+    (resumes / "quebrado.xml").write_bytes(b"<CURRICULO-VITAE")
+    themes = tmp_path / "temas.csv"
+    pd.DataFrame({"aluno": ["Caio", "Davi", "Eva"], "tema": ["Redes sem fio", "Aprendizado de máquina", None]}).to_csv(
+        themes, index=False
+    )
+    return resumes, themes
+
+
+def test_writes_the_top_k_professors_of_every_theme_as_csv(inputs, tmp_path, capsys):
+    resumes, themes = inputs
+    output = tmp_path / "ranking.csv"
+
+    main([
+        str(resumes), str(themes), "--output", str(output), "--backend", "lexical", "--top-k", "1",
+        "--chunk-size", "2", "--workers", "1", "--cache-path", "",
+    ])
+    ranking = pd.read_csv(output)
+    assert list(ranking.columns) == ["aluno", "tema", "Posição", "Professor", "Score"]
+    assert list(ranking["aluno"]) == ["Caio", "Davi", "Eva"]
+    assert list(ranking["Professor"][:2]) == ["Ana", "Bia"]
+    assert (ranking["Posição"] == 1).all()
+    out = capsys.readouterr().out
+    assert "quebrado.xml: XML inválido" in out and "2 professors parsed" in out
+
+
+def test_parquet_output_without_pyarrow_fails_before_parsing(inputs, tmp_path, monkeypatch, capsys):
+    resumes, themes = inputs
+    # A None entry makes the import raise ImportError, as when pyarrow isn't installed
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+
+    with pytest.raises(SystemExit):
+        main([str(resumes), str(themes), "--output", str(tmp_path / "ranking.parquet"), "--backend", "lexical"])
+    assert "pip install pyarrow" in capsys.readouterr().err
+    assert not (tmp_path / "ranking.parquet").exists()
@@ -0,0 +1,159 @@
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.cache import LRUCache, PersistentCache, ResultCache, SimilarityCache
+from src.facade import ResumesFacade
+from src.scoring import LexicalBackend
+
+
+def test_similarity_cache_reads_memory_then_disk(tmp_path):
+    disk = PersistentCache(str(tmp_path / "cache.sqlite3"))
+    disk.set_many({"m\x1fa": 0.5})
+    cache = SimilarityCache(LRUCache(), disk)
+    cache.set_many({"m\x1fb": 0.7})
+
+    assert cache.get_many(["m\x1fa", "m\x1fb", "m\x1fc"]) == {"m\x1fa": 0.5, "m\x1fb": 0.7}
+    assert cache.get_many(["m\x1fa"]) == {"m\x1fa": 0.5}
+    assert cache.stats | {"hit_rate": None} == {
+        "memory_hits": 2, "disk_hits": 1, "misses": 1, "hit_rate": None, "memory_entries": 2,
+    }
+
+
+def test_similarity_cache_counters_are_exact_across_threads():
+    # Switch threads as often as possible so unguarded += would lose updates
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        cache = SimilarityCache(LRUCache())
+        cache.set_many({"hit": 1.0})
+        lookups = 2_000
+
+        def lookup():
+            for _ in range(lookups):
+                cache.get_many(["hit", "miss"])
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert cache.stats["memory_hits"] == cache.stats["misses"] == 8 * lookups
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Wall clock seen by the persistent cache, moved forward by hand"""
+    now = [1_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_persistent_cache_expires_entries_after_their_ttl(tmp_path, clock):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite3"), ttl=60, evict_every=2)
+    cache.set_many({"a": 1})
+    clock[0] += 30
+    assert cache.get_many(["a"]) == {"a": 1}
+
+    clock[0] += 31
+    # Reading refreshes accessed_at only, the TTL counts from the write
+    assert cache.get_many(["a"]) == {}
+    assert len(cache) == 1
+    cache.set_many({"b": 2})
+    assert len(cache) == 1 and cache.get_many(["b"]) == {"b": 2}
+
+
+def test_persistent_cache_evicts_the_least_recently_accessed_entries(tmp_path, clock):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite3"), max_entries=2, evict_every=1)
+    for key in ("a", "b"):
+        cache.set_many({key: key})
+        clock[0] += 1
+    cache.get_many(["a"])
+    clock[0] += 1
+    cache.set_many({"c": "c"})
+
+    assert len(cache) == 2
+    assert cache.get_many(["a", "b", "c"]) == {"a": "a", "c": "c"}
+
+
+def professors(*names: str, content_hash=None) -> pd.DataFrame:
+    return pd.DataFrame({
+        "professor_id": range(1, len(names) + 1),
+        "nome": list(names),
+        "areas_de_atuacao": [[f"Área de {nome}"] for nome in names],
+        "embeddings": [None] * len(names),
+        "content_hash": [content_hash] * len(names),
+    })
+
+
+def ranking(*names: str):
+    return ResumesFacade.scores_frame({nome: 0.5 for nome in names})
+
+
+def test_result_cache_folds_near_duplicate_themes():
+    cache = ResultCache()
+    cache.set("Aprendizado de máquina na saúde", "v1", *ranking("Ana"))
+
+    assert cache.get("  aprendizado de MAQUINA, na saude!", "v1") is not None
+    assert cache.get("Aprendizado de máquina", "v1") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_professors_version_changes_with_the_professors_set():
+    version = ResumesFacade.professors_version(professors("Ana", "Bia"))
+
+    assert ResumesFacade.professors_version(professors("Ana", "Bia").iloc[::-1]) == version
+    assert ResumesFacade.professors_version(professors("Ana", "Bia", "Caio")) != version
+    assert ResumesFacade.professors_version(professors("Ana")) != version
+    # Rows updated in place without a resume fingerprint: only the name or specialities change
+    renamed = professors("Ana", "Bia")
+    renamed.loc[1, "nome"] = "Beatriz"
+    assert ResumesFacade.professors_version(renamed) != version
+    updated = professors("Ana", "Bia")
+    updated.at[1, "areas_de_atuacao"] = ["Grafos"]
+    assert ResumesFacade.professors_version(updated) != version
+
+
+def test_calculate_similarity_keeps_top_k_rankings_apart():
+    cache = ResultCache()
+    facade = ResumesFacade(None, LexicalBackend(), result_cache=cache)
+    catalog = professors("Ana", "Bia", "Caio")
+
+    everyone = facade.calculate_similarity(catalog, "Área de Ana")[0]
+    best = facade.calculate_similarity(catalog, "Área de Ana", top_k=1)[0]
+    assert (len(everyone), len(best), len(cache)) == (3, 1, 2)
+    assert len(facade.calculate_similarity(catalog, "área de ana", top_k=1)[0]) == 1
+    assert cache.hits == 1
+
+
+def test_result_cache_evicts_the_least_recently_used_rankings():
+    cache = ResultCache(max_entries=2, max_bytes=None)
+    for theme in ("a", "b"):
+        cache.set(theme, "v1", *ranking("Ana"))
+    cache.get("a", "v1")
+    cache.set("c", "v1", *ranking("Ana"))
+
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") is not None and cache.get("c", "v1") is not None
+    assert cache.evictions == 1
+
+
+def test_result_cache_evicts_beyond_its_memory_limit():
+    scores, best = ranking(*(f"Professor {index}" for index in range(50)))
+    size = int(scores.memory_usage(index=True, deep=True).sum()) + best.nbytes + sum(map(sys.getsizeof, best))
+    cache = ResultCache(max_bytes=int(size * 2.5))
+    for theme in ("a", "b", "c"):
+        cache.set(theme, "v1", scores, best)
+
+    assert len(cache) == 2 and cache.memory_bytes == 2 * size
+    assert cache.get("a", "v1") is None
+    # A ranking that alone exceeds the limit isn't kept
+    cache.set("big", "v1", *ranking(*(f"Professor {index}" for index in range(500))))
+    assert cache.get("big", "v1") is None and len(cache) == 2
+    assert cache.evictions == 1
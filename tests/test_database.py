@@ -0,0 +1,137 @@
+import numpy as np
+from sqlalchemy.sql import text
+
+from src.ann import IVFIndex
+from src.database import Database
+from src.embeddings import pack_embeddings
+
+
+def catalog(db: Database) -> list:
+    with db.engine.connect() as connection:
+        return connection.execute(text("SELECT nome, content_hash FROM docentes ORDER BY professor_id")).all()
+
+
+def professor_ids(db: Database, user_id: int) -> list:
+    with db.engine.connect() as connection:
+        return connection.execute(text("SELECT professores FROM users WHERE id = :id"), {"id": user_id}).scalar()
+
+
+def embedding(count: int, seed: int = 0) -> bytes:
+    vectors = np.random.default_rng(seed).standard_normal((count, 4)).astype(np.float32)
+    return pack_embeddings(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+
+def test_specialities_are_stored_as_given(db):
+    teachers = {"Ana": [""], "Bia": ["Redes", "Grafos, \x1f e afins"], "Caio": []}
+    db.create_professors(teachers, 1)
+
+    stored = db.read_professor(1)
+    assert dict(zip(stored["nome"], map(list, stored["areas_de_atuacao"]))) == teachers
+
+
+def test_uploading_the_same_professors_again_changes_nothing(db):
+    teachers = {"Ana": ["Redes"], "Bia": ["Grafos"]}
+    embeddings = {"Ana": embedding(1), "Bia": embedding(1)}
+    db.create_professors(teachers, 1, embeddings, {"Ana": "a1", "Bia": "b1"})
+
+    again = db.create_professors(teachers, 1, embeddings, {"Ana": "a1", "Bia": "b1"})
+    assert again.empty
+    assert list(again.columns) == ["professor_id", "nome", "areas_de_atuacao", "embeddings", "content_hash"]
+    assert sorted(db.read_professor(1)["nome"]) == ["Ana", "Bia"]
+
+
+def test_bulk_upsert_inserts_skips_unchanged_and_updates_changed_professors(db):
+    teachers = {f"Professor {index}": [f"Área {index}"] for index in range(300)}
+    lattes_ids = {teacher: str(index) for index, teacher in enumerate(teachers)}
+    inserted = db.create_professors(teachers, 1, lattes_ids=lattes_ids)
+    assert sorted(inserted["nome"]) == sorted(teachers)
+    ids = dict(zip(inserted["nome"], inserted["professor_id"]))
+
+    assert db.create_professors(teachers, 1, lattes_ids=lattes_ids).empty
+
+    changed = {"Professor 7": ["Área 7", "Grafos"], "Professor 42": ["Redes"]}
+    updated = db.create_professors({**teachers, **changed}, 1, {"Professor 7": embedding(2)}, lattes_ids=lattes_ids)
+    assert dict(zip(updated["nome"], map(list, updated["areas_de_atuacao"]))) == changed
+    stored = db.read_professor(1).set_index("nome")
+    assert len(stored) == 300 and dict(zip(stored.index, stored["professor_id"])) == ids
+    assert list(stored.loc["Professor 42", "areas_de_atuacao"]) == ["Redes"]
+    assert db.index.professor_ids() == {ids["Professor 7"]}
+    assert sorted(professor_ids(db, 1)) == sorted(ids.values())
+
+
+def test_replaced_professors_are_removed_once_unlinked_from_everyone(db):
+    db.create_professors({"Ana": ["Redes"]}, 1, {"Ana": embedding(1)}, {"Ana": "v1"})
+    db.create_professors({"Ana": ["Redes"]}, 2, {"Ana": embedding(1)}, {"Ana": "v1"})
+    old_id = int(db.read_professor(1)["professor_id"][0])
+
+    db.create_professors({"Ana": ["Redes", "Grafos"]}, 1, {"Ana": embedding(2)}, {"Ana": "v2"})
+    assert catalog(db) == [("Ana", "v1"), ("Ana", "v2")]
+    assert old_id in db.index._ids
+
+    db.create_professors({"Ana": ["Redes", "Grafos"]}, 2, {"Ana": embedding(2)}, {"Ana": "v2"})
+    assert catalog(db) == [("Ana", "v2")]
+    assert old_id not in db.index._ids
+    assert professor_ids(db, 1) == professor_ids(db, 2) == [int(db.read_professor(1)["professor_id"][0])]
+
+
+def test_delete_professor_only_unlinks_the_given_user(db):
+    for user_id in [1, 2]:
+        db.create_professors({"Ana": ["Redes"]}, user_id)
+    professor_id = int(db.read_professor(1)["professor_id"][0])
+
+    db.delete_professor(professor_id, 1)
+    assert db.read_professor(1) is None
+    assert list(db.read_professor(2)["professor_id"]) == [professor_id]
+    assert catalog(db) == [("Ana", None)]
+
+    db.delete_professor(professor_id, 2)
+    assert catalog(db) == []
+    assert professor_ids(db, 2) == []
+
+
+def test_purge_professor_unlinks_every_user(db):
+    for user_id in [1, 2]:
+        db.create_professors({"Ana": ["Redes"], "Bia": ["Grafos"]}, user_id)
+    professors = db.read_professor(1)
+    ana = int(professors.loc[professors["nome"] == "Ana", "professor_id"].iloc[0])
+
+    assert db.purge_professor(ana)
+    assert catalog(db) == [("Bia", None)]
+    for user_id in [1, 2]:
+        assert list(db.read_professor(user_id)["nome"]) == ["Bia"]
+        assert ana not in professor_ids(db, user_id)
+    assert not db.purge_professor(ana)
+
+
+def test_sync_index_recovers_the_writes_lost_by_an_unclean_stop(db, tmp_path):
+    path = str(tmp_path / "index.npz")
+    db.create_professors(
+        {"Ana": ["Redes"], "Bia": ["Grafos"]}, 1, {"Ana": embedding(1, 1), "Bia": embedding(1, 2)},
+        lattes_ids={"Ana": "1"},
+    )
+    db.index = IVFIndex(path=path, save_every=100)
+    assert db.sync_index(db.index)
+    db.index.save()
+
+    # Writes kept in memory only, the process stops before saving them
+    db.create_professors({"Caio": ["Física"]}, 1, {"Caio": embedding(1, 3)})
+    db.create_professors({"Ana": ["Redes", "IA"]}, 1, {"Ana": embedding(2, 4)}, lattes_ids={"Ana": "1"})
+    professors = db.read_professor(1).set_index("nome")["professor_id"]
+    db.delete_professor(professors["Bia"], 1)
+
+    loaded = IVFIndex.load(path)
+    assert loaded.professor_ids() == {professors["Ana"], professors["Bia"]}
+    assert db.sync_index(loaded)
+    assert loaded.professor_ids() == {professors["Ana"], professors["Caio"]}
+    query = np.random.default_rng(4).standard_normal(4).astype(np.float32)
+    assert loaded.search(query, k=5) == db.index.search(query, k=5)
+    assert loaded.synced_at > db.index.synced_at - 60
+
+
+def test_sync_index_fills_a_new_index(db):
+    db.create_professors({"Ana": ["Redes"], "Bia": ["Grafos"]}, 1, {"Ana": embedding(1)})
+    index = IVFIndex()
+
+    assert db.sync_index(index)
+    assert index.professor_ids() == set(db.read_professor(1).set_index("nome")["professor_id"][["Ana"]])
+    assert index.synced_at is not None
@@ -0,0 +1,26 @@
+import pytest
+
+from src.hasher import Hasher
+
+
+@pytest.fixture
+def hasher():
+    return Hasher(rounds=5)
+
+
+def test_hashes_with_fewer_rounds_need_rehashing(hasher):
+    weaker = Hasher(rounds=4).hash_pw("senha")
+
+    assert hasher.needs_rehash(weaker)
+    assert hasher.check_pw(weaker, "senha")
+
+
+def test_current_hashes_do_not_need_rehashing(hasher):
+    current = hasher.hash_pw("senha")
+
+    assert not hasher.needs_rehash(current)
+    assert hasher.check_pw(current, "senha") and not hasher.check_pw(current, "outra")
+
+
+def test_malformed_hashes_need_rehashing(hasher):
+    assert hasher.needs_rehash("texto-puro")
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+import pytest
+
+SCORING_STACK = {"src.ann", "src.facade", "src.jobs", "src.lattes", "src.model_client", "src.scoring"}
+
+
+def loaded_modules(module: str) -> set:
+    """Modules of src loaded by importing a module in a fresh interpreter"""
+    code = f"import sys, {module}; print(' '.join(name for name in sys.modules if name.startswith('src.')))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return set(output.split())
+
+
+def test_database_does_not_load_the_scoring_stack():
+    assert not loaded_modules("src.database") & SCORING_STACK
+
+
+def test_login_helpers_do_not_load_the_scoring_stack():
+    pytest.importorskip("streamlit_cookies_manager")
+    assert not loaded_modules("src.helpers") & SCORING_STACK
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+from sqlalchemy.sql import text
+
+from src.facade import ResumesFacade
+from src.jobs import IngestQueue, QueueFullError
+from src.scoring import LexicalBackend
+
+
+def resume(nome: str, *areas: str) -> bytes:
+    especialidades = "".join(f'<AREA-DE-ATUACAO NOME-DA-ESPECIALIDADE="{area}"/>' for area in areas)
+    return (
+        f'<CURRICULO-VITAE><DADOS-GERAIS NOME-COMPLETO="{nome}"><AREAS-DE-ATUACAO>{especialidades}'
+        "</AREAS-DE-ATUACAO></DADOS-GERAIS></CURRICULO-VITAE>"
+    ).encode()
+
+
+FILES = [("ana.xml", resume("Ana", "Redes")), ("quebrado.xml", b"<CURRICULO-VITAE"), ("bia.xml", resume("Bia", "Grafos"))]
+
+
+@pytest.fixture
+def queue(db) -> IngestQueue:
+    queue = IngestQueue(ResumesFacade(db, LexicalBackend()), max_queued=2, chunk_size=2, poll_interval=0.05)
+    yield queue
+    queue.stop(timeout=5)
+
+
+def job(db, job_id: int) -> dict:
+    return db.read_ingest_jobs(1, job_id=job_id).iloc[0].to_dict()
+
+
+def age_heartbeat(db, job_id: int, seconds: int) -> None:
+    with db.engine.begin() as connection:
+        connection.execute(
+            text("UPDATE ingest_jobs SET heartbeat_at = now() - make_interval(secs => :seconds) WHERE job_id = :job_id"),
+            {"seconds": seconds, "job_id": job_id},
+        )
+
+
+def test_submissions_beyond_the_queue_depth_are_refused(queue):
+    queue.submit(1, FILES)
+    queue.submit(2, FILES)
+    with pytest.raises(QueueFullError):
+        queue.submit(1, FILES)
+
+
+def test_run_stores_every_file_and_reports_progress(db, queue):
+    job_id = queue.submit(1, FILES, tema="Redes")
+    claimed = db.claim_ingest_job(stale_after=60)
+    assert claimed == {"job_id": job_id, "user_id": 1, "attempts": 1}
+
+    queue.run(job_id, 1)
+    finished = job(db, job_id)
+    assert finished["status"] == "done"
+    assert (finished["files_total"], finished["files_done"], finished["professors"]) == (3, 3, 2)
+    assert len(finished["errors"]) == 1 and finished["errors"][0].startswith("quebrado.xml: ")
+    assert sorted(db.read_professor(1)["nome"]) == ["Ana", "Bia"]
+    assert db.read_ingest_files(job_id, 10).empty
+    assert db.read_ingest_jobs(1, active=True).empty
+
+
+def test_claim_skips_jobs_locked_by_another_worker(db, queue):
+    first, second = queue.submit(1, FILES), queue.submit(1, FILES)
+    with db.engine.connect() as connection:
+        connection.execute(text("SELECT 1 FROM ingest_jobs WHERE job_id = :job_id FOR UPDATE"), {"job_id": first})
+        assert db.claim_ingest_job(stale_after=60)["job_id"] == second
+        connection.rollback()
+    assert db.claim_ingest_job(stale_after=60)["job_id"] == first
+    assert db.claim_ingest_job(stale_after=60) is None
+
+
+def test_stale_jobs_are_taken_over_from_their_first_pending_file(db, queue):
+    job_id = queue.submit(1, FILES)
+    db.claim_ingest_job(stale_after=60)
+    first_file = int(db.read_ingest_files(job_id, 1)["file_id"].iloc[0])
+    db.update_ingest_job(job_id, file_ids=[first_file], professors=1)
+    # The worker stopped after its first file, the job is only taken over once its heartbeat is stale
+    assert db.claim_ingest_job(stale_after=60) is None
+    age_heartbeat(db, job_id, 120)
+
+    assert db.claim_ingest_job(stale_after=60) == {"job_id": job_id, "user_id": 1, "attempts": 2}
+    assert list(db.read_ingest_files(job_id, 10)["file_name"]) == ["quebrado.xml", "bia.xml"]
+    queue.run(job_id, 1)
+    assert (job(db, job_id)["files_done"], job(db, job_id)["professors"]) == (3, 2)
+
+
+def test_workers_run_queued_jobs_and_give_up_after_max_attempts(db, queue):
+    queue.max_attempts = 1
+    abandoned = queue.submit(1, FILES)
+    db.claim_ingest_job(stale_after=60)
+    age_heartbeat(db, abandoned, 600)
+    queued = queue.submit(1, FILES)
+
+    queue.start()
+    deadline = time.monotonic() + 10
+    while not db.read_ingest_jobs(1, active=True).empty and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert job(db, queued)["status"] == "done"
+    assert job(db, abandoned)["status"] == "failed"
+    assert job(db, abandoned)["message"] == "O processamento foi interrompido vezes demais."
+
+
+def test_purge_deletes_only_old_finished_jobs(db, queue):
+    finished, pending = queue.submit(1, FILES), queue.submit(1, FILES)
+    db.finish_ingest_job(finished, "erro")
+    assert db.purge_ingest_jobs(older_than=3600) == 0
+    assert db.purge_ingest_jobs(older_than=0) == 1
+    assert list(db.read_ingest_jobs(1)["job_id"]) == [pending]
@@ -0,0 +1,112 @@
+import io
+import struct
+import zipfile
+
+import pytest
+
+from src.lattes import LattesParseError, parse_lattes, parse_resumes_bulk
+
+RESUME = (
+    '<?xml version="1.0" encoding="ISO-8859-1"?>'
+    '<CURRICULO-VITAE><DADOS-GERAIS NOME-COMPLETO="Maria Souza"><AREAS-DE-ATUACAO>'
+    '<AREA-DE-ATUACAO NOME-DA-AREA-DO-CONHECIMENTO="Ciência da Computação" NOME-DA-ESPECIALIDADE="Redes"/>'
+    '<AREA-DE-ATUACAO NOME-DA-AREA-DO-CONHECIMENTO="Educação" NOME-DA-SUB-AREA-DO-CONHECIMENTO="" '
+    'NOME-DA-ESPECIALIDADE=""/>'
+    "</AREAS-DE-ATUACAO></DADOS-GERAIS>"
+    # Areas of a co-author, outside DADOS-GERAIS, must be ignored
+    '<OUTRAS-INFORMACOES><AREA-DE-ATUACAO NOME-DA-ESPECIALIDADE="Astronomia"/></OUTRAS-INFORMACOES>'
+    "</CURRICULO-VITAE>"
+).encode("iso-8859-1")
+
+
+@pytest.mark.parametrize("chunk_size", [16, 64, 1024 * 1024])
+def test_parse_lattes_keeps_only_the_general_data(chunk_size):
+    assert parse_lattes(io.BytesIO(RESUME), chunk_size) == ("Maria Souza", ["Redes", "Educação"])
+
+
+def test_parse_lattes_rejects_malformed_xml():
+    with pytest.raises(LattesParseError):
+        parse_lattes(io.BytesIO(b"<CURRICULO-VITAE><DADOS-GERAIS"))
+
+
+def test_parse_lattes_requires_general_data():
+    with pytest.raises(LattesParseError):
+        parse_lattes(io.BytesIO(b"<CURRICULO-VITAE/>"))
+
+
+def patch_member(archive: bytearray, member: str, local_offset: int, central_offset: int, value: int) -> None:
+    """Overwrite a 2 bytes field of a member in both its local and central directory headers"""
+    data = bytes(archive)
+    position = data.find(b"PK\x01\x02")
+    while position != -1:
+        name_length = struct.unpack("<H", data[position + 28:position + 30])[0]
+        if data[position + 46:position + 46 + name_length] == member.encode():
+            header_offset = struct.unpack("<I", data[position + 42:position + 46])[0]
+            archive[position + central_offset:position + central_offset + 2] = struct.pack("<H", value)
+            archive[header_offset + local_offset:header_offset + local_offset + 2] = struct.pack("<H", value)
+        position = data.find(b"PK\x01\x02", position + 1)
+
+
+def broken_archive() -> bytes:
+    """Zip with a valid resume, a corrupted, an encrypted and an unsupported member"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for member in ("valido.xml", "corrompido.xml", "criptografado.xml", "bzip.xml"):
+            archive.writestr(member, RESUME * (50 if member == "corrompido.xml" else 1))
+    data = bytearray(buffer.getvalue())
+    with zipfile.ZipFile(io.BytesIO(bytes(data))) as archive:
+        corrupted = archive.getinfo("corrompido.xml")
+    start = corrupted.header_offset + 30 + len(corrupted.filename) + 2
+    data[start:start + 10] = bytes(byte ^ 0xFF for byte in data[start:start + 10])
+    patch_member(data, "criptografado.xml", 6, 8, 0x1)
+    patch_member(data, "bzip.xml", 8, 10, 99)
+    return bytes(data)
+
+
+def test_bad_zip_members_are_reported_one_by_one():
+    parsed = parse_resumes_bulk([("lote.zip", io.BytesIO(broken_archive()))])
+
+    assert parsed.professors == {"Maria Souza": ["Redes", "Educação"]}
+    assert sorted(file_name for file_name, _ in parsed.errors) == [
+        "lote.zip/bzip.xml", "lote.zip/corrompido.xml", "lote.zip/criptografado.xml",
+    ]
+
+
+def test_corrupted_zip_is_reported_with_the_rest_of_the_upload_parsed():
+    parsed = parse_resumes_bulk([("lote.zip", io.BytesIO(b"PK\x03\x04 truncado")), ("maria.xml", io.BytesIO(RESUME))])
+
+    assert list(parsed.professors) == ["Maria Souza"]
+    assert [file_name for file_name, _ in parsed.errors] == ["lote.zip"]
+
+
+def dated_resume(data_atualizacao: str, especialidade: str = "Redes") -> bytes:
+    return (
+        f'<CURRICULO-VITAE DATA-ATUALIZACAO="{data_atualizacao}" NUMERO-IDENTIFICADOR="123">'
+        f'<DADOS-GERAIS NOME-COMPLETO="Maria Souza"><AREAS-DE-ATUACAO>'
+        f'<AREA-DE-ATUACAO NOME-DA-ESPECIALIDADE="{especialidade}"/></AREAS-DE-ATUACAO></DADOS-GERAIS>'
+        "</CURRICULO-VITAE>"
+    ).encode()
+
+
+def stored_fingerprints() -> set:
+    stored = parse_resumes_bulk([("maria.xml", io.BytesIO(dated_resume("01012024")))])
+    assert stored.fingerprints["Maria Souza"].startswith("01012024:")
+    assert stored.lattes_ids == {"Maria Souza": "123"}
+    return set(stored.fingerprints.values())
+
+
+def test_unchanged_resumes_are_skipped():
+    parsed = parse_resumes_bulk(
+        [("maria.xml", io.BytesIO(dated_resume("01012024")))], known_fingerprints=stored_fingerprints()
+    )
+    assert (parsed.professors, parsed.errors, parsed.skipped) == ({}, [], 1)
+
+
+@pytest.mark.parametrize("data_atualizacao, especialidade", [("02022024", "Redes"), ("01012024", "Grafos")])
+def test_resumes_with_a_new_update_date_or_content_are_parsed_again(data_atualizacao, especialidade):
+    known = stored_fingerprints()
+    parsed = parse_resumes_bulk(
+        [("maria.xml", io.BytesIO(dated_resume(data_atualizacao, especialidade)))], known_fingerprints=known
+    )
+    assert (parsed.professors, parsed.skipped) == ({"Maria Souza": [especialidade]}, 0)
+    assert parsed.fingerprints["Maria Souza"] not in known
@@ -0,0 +1,37 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.metrics import Metrics
+
+
+@pytest.fixture
+def registry():
+    registry = Metrics()
+    registry.enabled = True
+    registry.increment("ingest_jobs_total", result="done")
+    return registry
+
+
+def test_serves_on_the_loopback_interface_by_default(registry):
+    server = registry.serve(0)
+    try:
+        host, port = server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert 'ingest_jobs_total{result="done"} 1' in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError, match="404"):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_other_interfaces_are_an_explicit_choice(registry):
+    server = registry.serve(0, host="0.0.0.0")
+    try:
+        assert server.server_address[0] == "0.0.0.0"
+    finally:
+        server.shutdown()
+        server.server_close()
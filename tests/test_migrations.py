@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy.sql import text
+
+from src.migrations import apply_migrations, list_migrations
+
+
+def explain(connection, query: str, params: dict) -> str:
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    return "\n".join(connection.execute(text(f"EXPLAIN {query}"), params).scalars())
+
+
+def test_migrations_are_applied_once(engine):
+    assert apply_migrations(engine) == [version for version, _, _ in list_migrations()]
+    assert apply_migrations(engine) == []
+
+
+def test_duplicated_professors_are_backed_up(engine):
+    apply_migrations(engine, target=2)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO users (username, email, senha) VALUES ('u', 'u@x', '')")
+        connection.exec_driver_sql(
+            """INSERT INTO docentes (user_id, nome, areas_de_atuacao) VALUES
+            (1, 'Ana', '{Redes}'), (1, 'Ana', '{Redes,Grafos}'), (1, 'Ana', '{Grafos}'), (1, 'Bia', '{Física}')"""
+        )
+    apply_migrations(engine, target=3)
+    with engine.connect() as connection:
+        kept = connection.exec_driver_sql("SELECT professor_id, nome FROM docentes ORDER BY professor_id").all()
+        removed = connection.exec_driver_sql(
+            "SELECT professor_id, nome, areas_de_atuacao, kept_id FROM docentes_duplicados ORDER BY professor_id"
+        ).all()
+    assert kept == [(3, "Ana"), (4, "Bia")]
+    assert removed == [(1, "Ana", ["Redes"], 3), (2, "Ana", ["Redes", "Grafos"], 3)]
+
+
+def test_duplicated_emails_make_the_migration_fail(engine):
+    apply_migrations(engine, target=2)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO users (username, email, senha) VALUES ('a', 'a@x', ''), ('b', 'a@x', '')")
+    with pytest.raises(Exception, match="users_email_key"):
+        apply_migrations(engine)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT max(version) FROM schema_migrations").scalar() == 2
+
+
+@pytest.mark.parametrize(
+    "query, params, index",
+    [
+        ("SELECT id, username, senha FROM users WHERE email = :email", {"email": "u@x"}, "users_email_key"),
+        (
+            "SELECT professor_id FROM docentes_usuarios WHERE user_id = :user_id",
+            {"user_id": 1},
+            "docentes_usuarios_pkey",
+        ),
+        (
+            "SELECT user_id FROM docentes_usuarios WHERE professor_id = :professor_id",
+            {"professor_id": 1},
+            "docentes_usuarios_professor_id_idx",
+        ),
+        (
+            "SELECT professor_id FROM docentes WHERE catalog_key = ANY(CAST(:keys AS text[]))",
+            {"keys": ["lattes:1"]},
+            "docentes_catalog_key_key",
+        ),
+        (
+            "SELECT professor_id FROM docentes WHERE updated_at > to_timestamp(:updated_after)",
+            {"updated_after": 0},
+            "docentes_updated_at_idx",
+        ),
+    ],
+)
+def test_hot_path_queries_use_their_index(engine, query, params, index):
+    apply_migrations(engine)
+    with engine.begin() as connection:
+        assert index in explain(connection, query, params)
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from src.model_client import ModelClient, ModelUnavailableError
+
+
+def embed(client: ModelClient, url: str, text: str = "tema"):
+    return client.post(url, {"inputs": [text]})
+
+
+def test_retries_until_the_model_answers(stub):
+    server = stub(fail_first=2)
+    client = ModelClient(base_delay=0.01, max_delay=0.05, deadline=5)
+
+    assert len(embed(client, server.feature_extraction_url)[0]) == server.dim
+    assert server.requests == 3
+
+
+def test_gives_up_after_max_retries(stub):
+    server = stub(error_rate=1.0)
+    client = ModelClient(max_retries=2, base_delay=0.01, max_delay=0.05, deadline=5)
+
+    with pytest.raises(ModelUnavailableError):
+        embed(client, server.feature_extraction_url)
+    assert server.requests == 3
+
+
+def test_waits_for_retry_after(stub):
+    server = stub(fail_first=1, retry_after=0.3)
+    client = ModelClient(base_delay=0.0, deadline=5)
+
+    start = time.monotonic()
+    embed(client, server.feature_extraction_url)
+    assert time.monotonic() - start >= 0.3
+
+
+def test_retry_after_beyond_the_deadline_fails_right_away(stub):
+    server = stub(fail_first=1, retry_after=10)
+    client = ModelClient(max_delay=30, deadline=1)
+
+    start = time.monotonic()
+    with pytest.raises(ModelUnavailableError):
+        embed(client, server.feature_extraction_url)
+    assert time.monotonic() - start < 0.5
+    assert server.requests == 1
+
+
+def test_hanging_model_fails_at_the_deadline(stub):
+    server = stub(hang_rate=1.0, hang_ms=5_000)
+    client = ModelClient(timeout=0.2, base_delay=0.01, max_delay=0.05, deadline=0.5)
+
+    start = time.monotonic()
+    with pytest.raises(ModelUnavailableError):
+        embed(client, server.feature_extraction_url)
+    assert time.monotonic() - start < 0.8
+
+
+def test_post_many_keeps_the_payloads_order(stub):
+    server = stub()
+    client = ModelClient(max_concurrency=3)
+    texts = [f"tema {index}" for index in range(7)]
+
+    answers = client.post_many(server.feature_extraction_url, [{"inputs": [text]} for text in texts])
+    assert answers == [server.embed([text]).tolist() for text in texts]
+
+
+def test_post_many_deadline_covers_the_whole_batch(stub):
+    server = stub(hang_rate=1.0, hang_ms=5_000)
+    client = ModelClient(max_concurrency=2, timeout=5, max_retries=0)
+
+    start = time.monotonic()
+    with pytest.raises(ModelUnavailableError):
+        client.post_many(server.feature_extraction_url, [{"inputs": ["tema"]}] * 6, deadline=0.5)
+    assert time.monotonic() - start < 0.8
+
+
+def test_post_many_cancels_the_batch_on_the_first_failure(stub):
+    server = stub(error_rate=1.0)
+    client = ModelClient(max_concurrency=1, max_retries=0, deadline=5)
+
+    with pytest.raises(ModelUnavailableError):
+        client.post_many(server.feature_extraction_url, [{"inputs": ["tema"]}] * 6)
+    assert server.requests < 6
+
+
+def test_single_payload_calls_share_the_concurrency_bound(stub):
+    server = stub(latency_ms=200)
+    client = ModelClient(max_concurrency=2, deadline=5)
+
+    threads = [
+        threading.Thread(target=client.post_many, args=(server.feature_extraction_url, [{"inputs": ["tema"]}]))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.requests == 6
+    assert server.max_in_flight <= 2
+
+
+def test_malformed_answers_are_reported_as_unavailability(stub):
+    server = stub(malformed_rate=1.0)
+    client = ModelClient(deadline=5)
+
+    with pytest.raises(ModelUnavailableError, match="Resposta inválida"):
+        embed(client, server.feature_extraction_url)
+    assert server.requests == 1
@@ -0,0 +1,127 @@
+import time
+
+import pandas as pd
+import pytest
+
+from src.ann import IVFIndex
+from src.cache import ResultCache
+from src.facade import ResumesFacade
+from src.model_client import ModelClient
+from src.scoring import FallbackBackend, LexicalBackend, RemoteBackend, pack_embeddings
+
+AREAS = {"Ana": ["Redes de computadores"], "Bia": ["Aprendizado de máquina"]}
+THEME = "Aprendizado de máquina em redes"
+
+
+@pytest.fixture
+def professors(stub):
+    # Ana has stored embeddings, Bia is scored by the similarity endpoint: two sequential requests
+    server = stub()
+    return pd.DataFrame({
+        "nome": list(AREAS),
+        "areas_de_atuacao": list(AREAS.values()),
+        "embeddings": [pack_embeddings(server.embed(AREAS["Ana"])), None],
+    })
+
+
+def remote_backend(server, deadline, **options):
+    client = ModelClient(max_retries=0, timeout=5)
+    return RemoteBackend(client, server.similarity_url, server.feature_extraction_url, deadline=deadline, **options)
+
+
+@pytest.fixture
+def catalog(stub):
+    server = stub()
+    areas = [["Redes de computadores"], ["Aprendizado de máquina"], ["Engenharia de software"]]
+    professors = pd.DataFrame({
+        "professor_id": [1, 2, 3],
+        "nome": ["Ana", "Bia", "Caio"],
+        "areas_de_atuacao": areas,
+        "embeddings": [pack_embeddings(server.embed(specialities)) for specialities in areas],
+    })
+    index = IVFIndex()
+    index.add_many((professor_id, server.embed(specialities)) for professor_id, specialities in zip([1, 2, 3], areas))
+    return server, professors, index
+
+
+def test_uses_the_primary_backend_while_the_model_answers(stub, professors):
+    backend = FallbackBackend(remote_backend(stub(), deadline=5), LexicalBackend())
+
+    scores, used_fallback = backend.score_with_fallback(professors, THEME)
+    assert set(scores) == set(AREAS)
+    assert not used_fallback
+
+
+def test_falls_back_when_the_model_answers_something_else_than_json(stub, professors):
+    backend = FallbackBackend(remote_backend(stub(malformed_rate=1.0), deadline=5), LexicalBackend())
+
+    scores, used_fallback = backend.score_with_fallback(professors, THEME)
+    assert used_fallback
+    assert scores == LexicalBackend().score(professors, THEME)
+
+
+def test_one_deadline_covers_every_request_of_a_call(stub, professors):
+    # Each request fits in the deadline, both together don't
+    server = stub(latency_ms=300)
+    backend = FallbackBackend(remote_backend(server, deadline=0.5), LexicalBackend())
+
+    start = time.monotonic()
+    scores, used_fallback = backend.score_with_fallback(professors, THEME)
+    assert time.monotonic() - start < 0.8
+    assert used_fallback
+    assert scores == LexicalBackend().score(professors, THEME)
+
+
+def test_score_many_falls_back_within_the_deadline(stub, professors):
+    server = stub(hang_rate=1.0, hang_ms=5_000)
+    backend = FallbackBackend(remote_backend(server, deadline=0.5), LexicalBackend())
+
+    start = time.monotonic()
+    scores, used_fallback = backend.score_many_with_fallback(professors, [THEME, "Redes"])
+    assert time.monotonic() - start < 0.8
+    assert used_fallback
+    assert scores.shape == (2, len(AREAS))
+
+
+def test_facade_returns_the_fallback_flag(stub, professors):
+    server = stub(error_rate=1.0)
+    facade = ResumesFacade(None, FallbackBackend(remote_backend(server, deadline=5), LexicalBackend()))
+
+    _, melhores, used_fallback = facade.calculate_similarity(professors, THEME)
+    assert used_fallback
+    assert len(melhores)
+    assert all(used_fallback for _, used_fallback in facade.rank_themes(professors, [THEME], k=1))
+
+
+def test_large_catalogs_are_scored_in_full_unless_top_k_is_asked(catalog):
+    server, professors, index = catalog
+    backend = remote_backend(server, deadline=5, index=index, index_threshold=2)
+
+    scores = backend.score(professors, THEME)
+    assert set(scores) == {"Ana", "Bia", "Caio"}
+
+    best = backend.score(professors, THEME, top_k=2)
+    assert list(best) == sorted(scores, key=scores.get, reverse=True)[:2]
+    assert best == pytest.approx({nome: scores[nome] for nome in best}, abs=1e-5)
+
+
+def test_top_k_rankings_are_cached_apart(catalog):
+    server, professors, index = catalog
+    facade = ResumesFacade(
+        None, remote_backend(server, deadline=5, index=index, index_threshold=2), result_cache=ResultCache()
+    )
+
+    assert len(facade.calculate_similarity(professors, THEME, top_k=1)[0]) == 1
+    assert len(facade.calculate_similarity(professors, THEME)[0]) == 3
+
+
+def test_top_k_searches_keep_the_professors_stored_without_embeddings(catalog):
+    server, professors, index = catalog
+    # Stored during a model outage: never indexed, scored by the similarity endpoint
+    davi = pd.DataFrame({"professor_id": [4], "nome": ["Davi"], "areas_de_atuacao": [[THEME]], "embeddings": [None]})
+    backend = remote_backend(server, deadline=5, index=index, index_threshold=2)
+
+    best = backend.score(pd.concat([professors, davi], ignore_index=True), THEME, top_k=2)
+    assert list(best)[0] == "Davi"
+    assert best["Davi"] == pytest.approx(1.0, abs=1e-5)
+    assert len(best) == 2